@@ -1,9 +1,16 @@
 import os
 import logging
+import threading
+from collections import Counter, deque
+from itertools import islice
 from enum import Enum
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 from readDocs import OfficeDocumentExtractor
-from utils import extraer_id_archivo, renombrar_archivo_con_fechas
-from excel import create_excel_template, insert_certificate_data
+from utils import (
+    extraer_id_archivo, renombrar_archivo_con_fechas, archivo_ya_procesado,
+    calcular_hash_archivo, calcular_firma_minhash, IndiceMinHash, CacheResultados
+)
+from excel import ReportWriter
 
 # Enum simple para las extensiones prohibidas
 class ArchivoProhibido(Enum):
@@ -11,50 +18,324 @@ class ArchivoProhibido(Enum):
     EXE = '.exe'
     HTML = '.html'
 
+# Se calculan una sola vez al importar el módulo
+_EXTENSIONES_PROHIBIDAS = frozenset(ext.value for ext in ArchivoProhibido)
+# Reporte consolidado con una hoja por carpeta, en la raíz de certificates
+_NOMBRE_REPORTE = 'report_consolidado.xlsx'
+# Reportes que no son certificados: el consolidado y el report.xlsx que
+# antes se dejaba en cada carpeta
+_NOMBRES_REPORTE = frozenset({_NOMBRE_REPORTE, 'report.xlsx'})
+
+# Máximo de extracciones pendientes en el pool; limita la memoria usada
+# por resultados que aún no se han registrado
+_MAX_EN_VUELO = 32
+
+# Hilos para el hash y el renombrado: son operaciones de E/S que liberan el GIL
+_MAX_HILOS_ES = 8
+
+# Directorio de la caché de extracciones, indexada por el hash del contenido
+_DIRECTORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extract_cache')
+
+# Extractor propio de cada proceso del pool (se crea en _init_worker)
+_EXTRACTOR = None
+
+# Líneas del resumen de cada carpeta: (clave en el Counter, etiqueta)
+_LINEAS_RESUMEN = (
+    ('renombrado', 'Renombrados'),
+    ('sin_fecha', 'Sin fecha de emisión'),
+    ('duplicado', 'Posibles duplicados'),
+    ('copias', 'Copias idénticas'),
+    ('error', 'Errores'),
+)
+# Resultados de _registrar_resultado; su suma es el total de archivos registrados
+_RESULTADOS = ('renombrado', 'sin_fecha', 'duplicado', 'error')
+
+# Formato de los mensajes de logging, configurado una sola vez por proceso
+_FORMATO_LOG = '%(asctime)s - %(message)s'
+
+def _init_worker():
+    """
+    Inicializa el extractor una sola vez por proceso, evitando serializar
+    los clientes de IA en cada tarea.
+    """
+    global _EXTRACTOR
+    # Sin efecto si el proceso heredó la configuración del principal (fork)
+    logging.basicConfig(level=logging.INFO, format=_FORMATO_LOG)
+    _EXTRACTOR = OfficeDocumentExtractor()
+
+def _extract_one(path_file: str) -> tuple:
+    """
+    Extrae la información de un archivo dentro de un proceso del pool.
+
+    Returns:
+        tuple: (path_file, inference_response, firma_minhash, error). La firma
+        se calcula sobre el texto extraído y es None si no hubo texto. Si la
+        extracción falla, inference_response es None y error contiene el mensaje.
+    """
+    try:
+        inference_response, transcription = _EXTRACTOR.extract_content_with_transcription(path_file)
+        if not isinstance(inference_response, dict):
+            # Gemini informa sus fallas devolviendo un texto en lugar del diccionario
+            return path_file, None, None, str(inference_response)
+        return path_file, inference_response, calcular_firma_minhash(transcription), None
+    except Exception as e:
+        return path_file, None, None, str(e)
+
+def _recorrer_carpetas(raiz: str):
+    """
+    Recorre recursivamente una carpeta usando os.scandir.
+
+    A diferencia de os.walk, conserva los DirEntry de los archivos, cuyo tipo
+    ya viene en la entrada del directorio y no requiere un stat adicional.
+
+    Yields:
+        tuple: (ruta_carpeta, lista de DirEntry de los archivos de la carpeta)
+    """
+    archivos = []
+    subcarpetas = []
+    with os.scandir(raiz) as entradas:
+        for entrada in entradas:
+            if entrada.is_file(follow_symlinks=False):
+                archivos.append(entrada)
+            elif entrada.is_dir(follow_symlinks=False):
+                subcarpetas.append(entrada.path)
+
+    yield raiz, archivos
+
+    for subcarpeta in subcarpetas:
+        yield from _recorrer_carpetas(subcarpeta)
+
+def _registrar_resultado(path_file: str, inference_response: dict, error: str,
+                         duplicado_de: str, filas_reporte: list, candado: threading.Lock) -> str:
+    """
+    Renombra el archivo con sus fechas o, si no hay fecha de emisión, hubo
+    un error o es un posible duplicado, agrega la fila correspondiente al
+    reporte de la carpeta.
+
+    Se ejecuta en los hilos de E/S; candado protege filas_reporte.
+
+    Returns:
+        str: Resultado del registro ('renombrado', 'sin_fecha', 'duplicado'
+        o 'error'), para el resumen de la carpeta
+    """
+    if error is not None:
+        with candado:
+            filas_reporte.append({
+                'name': os.path.basename(path_file),
+                'message_error': error
+            })
+        return 'error'
+
+    if duplicado_de:
+        # Casi duplicado por OCR: no se renombra, se deja en el reporte
+        with candado:
+            filas_reporte.append({
+                **inference_response,
+                'name': os.path.basename(path_file),
+                'message_error': f"Posible duplicado de {duplicado_de}"
+            })
+        return 'duplicado'
+
+    issue_date = inference_response.get('issue_date')
+    expiration_date = inference_response.get('expiration_date')
+    # Llamamos a la función con las fechas correspondientes
+    if issue_date:
+        nueva_ruta = renombrar_archivo_con_fechas(
+            ruta_original=path_file,
+            issue_date=issue_date,
+            expiration_date=expiration_date
+        )
+        return 'renombrado' if nueva_ruta else 'error'
+
+    with candado:
+        filas_reporte.append({**inference_response, 'name': os.path.basename(path_file)})
+    return 'sin_fecha'
+
+def _imprimir_resumen(nombre_carpeta: str, resumen: Counter) -> None:
+    """
+    Imprime el resumen de una carpeta con el conteo y el porcentaje sobre el
+    total de archivos registrados. Se llama una sola vez, al terminar la carpeta.
+    """
+    total = sum(resumen[clave] for clave in _RESULTADOS)
+    lineas = [f"Resumen de la carpeta {nombre_carpeta}:"]
+    lineas.extend(
+        f"   - {etiqueta}: {resumen[clave]} ({resumen[clave] / total * 100 if total else 0:.1f}%)"
+        for clave, etiqueta in _LINEAS_RESUMEN
+    )
+    print('\n'.join(lineas))
+
+def _archivos_unicos(archivos_a_procesar: list, copias: dict, hilos: ThreadPoolExecutor):
+    """
+    Produce (path_file, hash_contenido) para los archivos de la carpeta que
+    deben extraerse. Los hashes se calculan en los hilos de E/S y se consumen
+    en el orden de archivos_a_procesar.
+    Los archivos idénticos byte a byte a uno anterior no se producen: se
+    agregan a copias[original].
+
+    Los hashes se piden a medida que se consume el generador, con a lo sumo
+    _MAX_HILOS_ES adelantados: un archivo se lee cuando se acerca su turno de
+    extracción, no todos al comenzar la carpeta.
+    """
+    hashes_contenido = {}
+    restantes = iter(archivos_a_procesar)
+    en_curso = deque()
+    while True:
+        # Se completa la ventana de hashes adelantados antes de esperar el siguiente
+        for path_file in islice(restantes, _MAX_HILOS_ES - len(en_curso)):
+            en_curso.append((path_file, hilos.submit(calcular_hash_archivo, path_file)))
+        if not en_curso:
+            return
+        path_file, futuro = en_curso.popleft()
+        hash_contenido = futuro.result()
+        # Una sola búsqueda en el diccionario: devuelve el original si ya
+        # existía o registra este archivo como original
+        original = hashes_contenido.setdefault(hash_contenido, path_file)
+        if original is not path_file:
+            copias[original].append(path_file)
+            print(f"{os.path.basename(path_file)} es idéntico a {os.path.basename(original)}")
+        else:
+            copias[path_file] = []
+            yield path_file, hash_contenido
+
+def _extraer_con_limite(executor: ProcessPoolExecutor, archivos, cache: CacheResultados,
+                        max_en_vuelo: int = _MAX_EN_VUELO):
+    """
+    Envía los archivos al pool sin superar max_en_vuelo extracciones pendientes
+    y produce los resultados en el orden en que terminan.
+
+    Los archivos cuyo contenido ya está en la caché no se envían al pool. Solo
+    se guardan en la caché los resultados nuevos válidos (sin error y con un
+    diccionario como respuesta), como en cached_inference de ia.py.
+
+    Como archivos se consume de forma perezosa, la lectura y el hash del
+    siguiente archivo se solapan con las extracciones en curso.
+    """
+    pendientes = {}
+
+    def _terminar(futuro):
+        hash_contenido = pendientes.pop(futuro)
+        path_file, inference_response, firma, error = futuro.result()
+        if error is None and isinstance(inference_response, dict):
+            cache.set(hash_contenido, [inference_response, firma])
+        return path_file, inference_response, firma, error
+
+    for path_file, hash_contenido in archivos:
+        guardado = cache.get(hash_contenido)
+        # Las entradas sin diccionario vienen de versiones que guardaban los
+        # textos de error de Gemini: se extraen de nuevo
+        if guardado is not None and isinstance(guardado[0], dict):
+            inference_response, firma = guardado
+            yield path_file, inference_response, tuple(firma) if firma else None, None
+            continue
+
+        pendientes[executor.submit(_extract_one, path_file)] = hash_contenido
+        if len(pendientes) >= max_en_vuelo:
+            terminados, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in terminados:
+                yield _terminar(futuro)
+
+    for futuro in as_completed(list(pendientes)):
+        yield _terminar(futuro)
+
+def _procesar_carpeta(executor: ProcessPoolExecutor, cache: CacheResultados, reporte: ReportWriter,
+                      raiz: str, archivos: list):
+    """
+    Procesa los archivos de una carpeta y agrega su hoja al reporte
+    consolidado si la carpeta tiene filas.
+    """
+    # Obtenemos el nombre de la carpeta actual
+    nombre_carpeta = os.path.basename(raiz)
+    print(f"\nLeyendo archivos en carpeta: {nombre_carpeta}")
+
+    # Filas del reporte de esta carpeta; se escriben todas al final
+    filas_reporte = []
+    # Conteo de resultados de la carpeta, llevado a medida que se registran
+    resumen = Counter()
+    # Protege filas_reporte y resumen, que se actualizan desde los hilos
+    candado = threading.Lock()
+
+    def _registrar(path_file, inference_response, error, duplicado_de):
+        resultado = _registrar_resultado(path_file, inference_response, error,
+                                         duplicado_de, filas_reporte, candado)
+        with candado:
+            resumen[resultado] += 1
+
+    try:
+        # El renombrado y el hash son E/S: se hacen en hilos mientras los
+        # procesos del pool extraen el contenido
+        with ThreadPoolExecutor(max_workers=_MAX_HILOS_ES) as hilos:
+            registros = []
+
+            archivos_a_procesar = []
+            for entrada in archivos:
+                nombre = entrada.name.lower()
+                extension = nombre[nombre.rfind('.'):]
+                # Los reportes no son certificados, ni los archivos ocultos (entre
+                # ellos el temporal del reporte consolidado mientras se escribe)
+                if extension in _EXTENSIONES_PROHIBIDAS or nombre in _NOMBRES_REPORTE or nombre.startswith('.'):
+                    continue
+                # Los nombres con el formato de renombrar_archivo_con_fechas ya
+                # se procesaron. Cualquier otra fecha en el nombre (de escaneo,
+                # de expiración...) no se toma como fecha de emisión
+                if archivo_ya_procesado(entrada.name):
+                    continue
+
+                archivos_a_procesar.append(entrada.path)
+
+            # Los archivos idénticos byte a byte no se extraen de nuevo:
+            # reutilizan el resultado del primero que se encontró
+            copias = {}
+            resultados_originales = {}
+            # Textos ya extraídos en la carpeta, para detectar copias escaneadas
+            indice_textos = IndiceMinHash(umbral=0.9)
+
+            archivos_unicos = _archivos_unicos(archivos_a_procesar, copias, hilos)
+            for path_file, inference_response, firma, error in _extraer_con_limite(executor, archivos_unicos, cache):
+                duplicado_de = indice_textos.consultar(firma) if firma else None
+                if firma and not duplicado_de:
+                    indice_textos.insertar(os.path.basename(path_file), firma)
+
+                resultados_originales[path_file] = (inference_response, error, duplicado_de)
+                registros.append(hilos.submit(_registrar, path_file, inference_response, error, duplicado_de))
+
+            # Las copias se registran al final, cuando ya se conoce el
+            # resultado de su original
+            for original, copias_original in copias.items():
+                for path_file in copias_original:
+                    registros.append(hilos.submit(_registrar, path_file, *resultados_originales[original]))
+                    with candado:
+                        resumen['copias'] += 1
+
+            # Propagamos cualquier excepción ocurrida en los hilos
+            for registro in registros:
+                registro.result()
+    finally:
+        # Las filas pasan al reporte consolidado apenas termina la carpeta,
+        # aunque su procesamiento se interrumpa
+        reporte.add_folder(nombre_carpeta, filas_reporte)
+
+        _imprimir_resumen(nombre_carpeta, resumen)
+
 def leer_todos_certificates():
-    extractor = OfficeDocumentExtractor()
     directorio_actual = os.path.dirname(os.path.abspath(__file__))
     carpeta_certificates = os.path.join(directorio_actual, 'certificates')
-    
+
     if not os.path.exists(carpeta_certificates):
         print(f"El directorio {carpeta_certificates} no existe")
         return
-    
-    extensiones_prohibidas = {ext.value for ext in ArchivoProhibido}
-    
-    for raiz, dirs, archivos in os.walk(carpeta_certificates):
-        # Obtenemos el nombre de la carpeta actual
-        nombre_carpeta = os.path.basename(raiz)
-        path_folder = os.path.join(raiz)
-
-        path_report = create_excel_template(path_folder)
-        
-        archivos_permitidos = [
-            archivo for archivo in archivos 
-            if os.path.splitext(archivo)[1].lower() not in extensiones_prohibidas
-        ]
-        
-        print(f"\nLeyendo archivos en carpeta: {nombre_carpeta}")
-        
-        for archivo in archivos_permitidos:
-            path_file = os.path.join(raiz, archivo)
-            try:
-                inference_response = extractor.extract_content(path_file)
-                issue_date = inference_response.get('issue_date')
-                expiration_date = inference_response.get('expiration_date')
-                # Llamamos a la función con las fechas correspondientes
-                if issue_date:
-                    renombrar_archivo_con_fechas(
-                        ruta_original=path_file,
-                        issue_date=issue_date,
-                        expiration_date=expiration_date
-                    )
-                else:
-                    inference_response['name'] = archivo
-                    insert_certificate_data(path_report, inference_response)
-            except Exception as e:
-                inference_response['message_error'] = e
-                insert_certificate_data(path_report, inference_response)
-                
+
+    cache = CacheResultados(_DIRECTORIO_CACHE)
+
+    # Un único reporte para todas las carpetas: cada una agrega su hoja al
+    # terminar y el archivo se guarda una sola vez al salir del bloque,
+    # también si el procesamiento se interrumpe
+    with ReportWriter(os.path.join(carpeta_certificates, _NOMBRE_REPORTE)) as reporte:
+        # La extracción (OCR + IA) corre en paralelo; el renombrado y el Excel
+        # se hacen en el proceso principal para no compartir estado entre procesos
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker) as executor:
+            for raiz, archivos in _recorrer_carpetas(carpeta_certificates):
+                _procesar_carpeta(executor, cache, reporte, raiz, archivos)
+
 if __name__ == "__main__":
-    leer_todos_certificates()
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format=_FORMATO_LOG)
+    leer_todos_certificates()
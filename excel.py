@@ -1,7 +1,388 @@
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
 from pathlib import Path
+from xml.sax.saxutils import quoteattr
 import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+
+# La configuración de logging (nivel y formato) la hace el programa que usa el módulo
+logger = logging.getLogger(__name__)
+
+# Encabezados de las columnas del reporte
+HEADERS = [
+    "Identificación",
+    "Nombre",
+    "Fecha de Emisión",
+    "Fecha de Expiración",
+    "error_message"
+]
+
+# Letra y ancho de cada columna, calculados una sola vez a partir de los
+# encabezados (el encabezado es la única fila al crear la hoja)
+_COLUMN_WIDTHS = tuple(
+    (get_column_letter(col), len(header) + 2) for col, header in enumerate(HEADERS, 1)
+)
+
+# Estilo del encabezado, compartido por todas las hojas
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_FILL = PatternFill(start_color="0066CC",
+                           end_color="0066CC",
+                           fill_type="solid")
+
+# Caracteres que Excel no admite en el nombre de una hoja
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+# Longitud máxima del nombre de una hoja en Excel
+_MAX_SHEET_TITLE = 31
+
+def _write_headers(ws) -> None:
+    """
+    Escribe los encabezados con formato en la primera fila de la hoja y
+    ajusta el ancho de las columnas.
+
+    Sirve tanto para hojas normales como de solo escritura: los anchos se
+    fijan antes de agregar la fila y el encabezado se agrega con ws.append.
+    """
+    for letter, width in _COLUMN_WIDTHS:
+        ws.column_dimensions[letter].width = width
+
+    cells = []
+    for header in HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = _HEADER_FONT
+        cell.fill = _HEADER_FILL
+        cells.append(cell)
+
+    ws.append(cells)
+
+def _sheet_title(name: str, used: set) -> str:
+    """
+    Convierte el nombre de una carpeta en un nombre de hoja válido y único:
+    sin caracteres prohibidos, de máximo 31 caracteres y sin repetir uno ya usado.
+    """
+    base = _INVALID_SHEET_CHARS.sub('_', name).strip("'") or "carpeta"
+    title = base[:_MAX_SHEET_TITLE]
+    counter = 1
+    while title.lower() in used:
+        suffix = f"_{counter}"
+        title = base[:_MAX_SHEET_TITLE - len(suffix)] + suffix
+        counter += 1
+    used.add(title.lower())
+    return title
+
+# Partes fijas del paquete xlsx que escribe StreamingXlsxReport
+_XLSX_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_XLSX_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_XLSX_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_ROOT_RELS = (
+    _XML_DECLARATION
+    + f'<Relationships xmlns="{_XLSX_PKG_REL_NS}">'
+    + f'<Relationship Id="rId1" Type="{_XLSX_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    + '</Relationships>'
+)
+
+# Estilos mínimos: el índice 1 de cellXfs es el encabezado (mismos colores
+# que _HEADER_FONT y _HEADER_FILL)
+_STYLES_XML = (
+    _XML_DECLARATION
+    + f'<styleSheet xmlns="{_XLSX_MAIN_NS}">'
+    + '<fonts count="2">'
+    + '<font><sz val="11"/><name val="Calibri"/></font>'
+    + '<font><b/><sz val="11"/><color rgb="FFFFFFFF"/><name val="Calibri"/></font>'
+    + '</fonts>'
+    + '<fills count="3">'
+    + '<fill><patternFill patternType="none"/></fill>'
+    + '<fill><patternFill patternType="gray125"/></fill>'
+    + '<fill><patternFill patternType="solid"><fgColor rgb="FF0066CC"/><bgColor rgb="FF0066CC"/></patternFill></fill>'
+    + '</fills>'
+    + '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    + '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    + '<cellXfs count="2">'
+    + '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    + '<xf numFmtId="0" fontId="1" fillId="2" borderId="0" xfId="0" applyFont="1" applyFill="1"/>'
+    + '</cellXfs>'
+    + '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    + '</styleSheet>'
+)
+_HEADER_STYLE_ID = 1
+
+# Escape de texto para XML con una sola llamada a str.translate por valor
+_XML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+# Caracteres de control que XML 1.0 no admite (tab, salto de línea y retorno sí)
+_XML_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+# Búfer del archivo de salida: las escrituras pequeñas del ZIP se agrupan en
+# bloques grandes antes de llegar al sistema operativo
+_OUTPUT_BUFFER_SIZE = 1024 * 1024
+# Tamaño a partir del cual el fragmento XML de una hoja pasa de memoria a disco
+_SHEET_SPOOL_SIZE = 1024 * 1024
+
+# Inicio de cada hoja: anchos de columna y apertura de sheetData
+_SHEET_START = (
+    _XML_DECLARATION
+    + f'<worksheet xmlns="{_XLSX_MAIN_NS}">'
+    + '<cols>'
+    + ''.join(
+        f'<col min="{col}" max="{col}" width="{width}" customWidth="1"/>'
+        for col, (_, width) in enumerate(_COLUMN_WIDTHS, 1)
+    )
+    + '</cols>'
+    + '<sheetData>'
+)
+_SHEET_END = '</sheetData></worksheet>'
+
+class StreamingXlsxReport:
+    """
+    Escribe un archivo xlsx generando directamente el XML de cada hoja dentro
+    del ZIP, sin pasar por openpyxl.
+
+    Los textos se guardan una sola vez en la tabla de cadenas compartidas
+    (sharedStrings.xml) y las celdas los referencian por índice, lo que reduce
+    el tamaño del reporte cuando se repiten nombres o mensajes de error.
+
+    Cada hoja tiene las columnas de HEADERS y el encabezado con formato. Sus
+    filas se convierten a XML al agregarse y se acumulan en un fragmento
+    propio (en memoria y, si crece, en un archivo temporal), así que se pueden
+    agregar filas a cualquier hoja en cualquier orden con append_row. Al
+    cerrar, cada fragmento se copia una sola vez a su parte del ZIP.
+
+    Se usa como context manager o llamando a close al terminar.
+
+    El ZIP se escribe en un archivo temporal de la misma carpeta y solo al
+    cerrarse reemplaza a excel_path, así que nunca queda un reporte a medias.
+
+    Con fast=True las hojas y la tabla de cadenas se guardan sin comprimir
+    (ZIP_STORED): el reporte se escribe más rápido a cambio de un archivo
+    varias veces más grande. Útil para reportes temporales.
+    """
+
+    def __init__(self, excel_path: Path, fast: bool = False):
+        self.excel_path = Path(excel_path)
+        # Compresión de las partes con datos; las partes fijas siempre se comprimen
+        self._data_compression = zipfile.ZIP_STORED if fast else zipfile.ZIP_DEFLATED
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=self.excel_path.parent, prefix=f'.{self.excel_path.name}.', suffix='.tmp'
+        )
+        self._file = os.fdopen(fd, 'wb', buffering=_OUTPUT_BUFFER_SIZE)
+        self._zip = zipfile.ZipFile(self._file, 'w', zipfile.ZIP_DEFLATED)
+        self._sheet_titles = []
+        self._used_titles = set()
+        # Por hoja: [fragmento con el XML de las filas, número de la siguiente fila]
+        self._sheets = {}
+        # Cadenas compartidas: texto -> índice, en orden de aparición
+        self._shared_strings = {}
+        # Número total de celdas de texto, para el atributo count de la tabla
+        self._string_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+    @property
+    def sheet_titles(self) -> list:
+        """
+        Nombres de las hojas agregadas hasta ahora, en orden.
+        """
+        return list(self._sheet_titles)
+
+    def discard(self) -> None:
+        """
+        Descarta el reporte: cierra y borra el archivo temporal sin tocar excel_path.
+        """
+        if self._zip is None:
+            return
+        try:
+            self._zip.close()
+        finally:
+            self._zip = None
+            self._file.close()
+            self._close_fragments()
+            if os.path.exists(self._tmp_path):
+                os.unlink(self._tmp_path)
+
+    def _row_xml(self, row_number: int, values, style: str = '') -> str:
+        """
+        Construye el XML de una fila. Las celdas vacías se omiten, los
+        números se escriben como valores numéricos y los textos como
+        referencias a la tabla de cadenas compartidas.
+        """
+        shared_strings = self._shared_strings
+        cells = []
+        for (letter, _), value in zip(_COLUMN_WIDTHS, values):
+            if value is None or value == '':
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                cells.append(f'<c r="{letter}{row_number}"{style}><v>{value}</v></c>')
+                continue
+            # Se quitan los caracteres de control antes de registrar el texto,
+            # así dos valores que solo difieren en ellos comparten índice.
+            # Una sola búsqueda: devuelve el índice existente o registra el nuevo
+            text = _XML_INVALID_CHARS.sub('', str(value))
+            index = shared_strings.setdefault(text, len(shared_strings))
+            self._string_count += 1
+            cells.append(f'<c r="{letter}{row_number}" t="s"{style}><v>{index}</v></c>')
+        return f'<row r="{row_number}">{"".join(cells)}</row>'
+
+    def _data_part(self, name: str) -> zipfile.ZipInfo:
+        """
+        Crea la entrada del ZIP para una parte con datos (hoja o tabla de
+        cadenas), con la compresión elegida en el constructor.
+        """
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = self._data_compression
+        return info
+
+    def _close_fragments(self) -> None:
+        """
+        Cierra los fragmentos de las hojas, liberando sus archivos temporales.
+        """
+        for fragment, _ in self._sheets.values():
+            fragment.close()
+        self._sheets.clear()
+
+    def open_sheet(self, name: str) -> str:
+        """
+        Crea una hoja con el encabezado, lista para recibir filas con append_row.
+
+        Args:
+            name: Nombre deseado para la hoja; se ajusta para que sea válido y único
+
+        Returns:
+            str: Nombre final de la hoja, que se usa en append_row
+        """
+        title = _sheet_title(name, self._used_titles)
+        self._sheet_titles.append(title)
+        fragment = tempfile.SpooledTemporaryFile(max_size=_SHEET_SPOOL_SIZE)
+        fragment.write(self._row_xml(1, HEADERS, f' s="{_HEADER_STYLE_ID}"').encode('utf-8'))
+        self._sheets[title] = [fragment, 2]
+        return title
+
+    def append_row(self, title: str, values) -> None:
+        """
+        Agrega una fila al final de la hoja title.
+
+        Args:
+            title: Nombre de la hoja devuelto por open_sheet
+            values: Un valor por columna de HEADERS
+        """
+        sheet = self._sheets[title]
+        sheet[0].write(self._row_xml(sheet[1], values).encode('utf-8'))
+        sheet[1] += 1
+
+    def add_sheet(self, name: str, rows) -> str:
+        """
+        Agrega una hoja con el encabezado y las filas dadas.
+
+        Args:
+            name: Nombre deseado para la hoja; se ajusta para que sea válido y único
+            rows: Iterable de filas, cada una con un valor por columna de HEADERS
+
+        Returns:
+            str: Nombre final de la hoja
+        """
+        title = self.open_sheet(name)
+        for values in rows:
+            self.append_row(title, values)
+        return title
+
+    def close(self) -> None:
+        """
+        Escribe las partes comunes del paquete (libro, relaciones, estilos y
+        tipos de contenido), cierra el archivo y lo mueve a excel_path.
+        """
+        if self._zip is None:
+            return
+
+        sheet_ids = range(1, len(self._sheet_titles) + 1)
+        styles_rel_id = len(self._sheet_titles) + 1
+        shared_strings_rel_id = styles_rel_id + 1
+
+        content_types = (
+            _XML_DECLARATION
+            + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            + '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            + '<Default Extension="xml" ContentType="application/xml"/>'
+            + '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            + '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            + ''.join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in sheet_ids
+            )
+            + '</Types>'
+        )
+        workbook = (
+            _XML_DECLARATION
+            + f'<workbook xmlns="{_XLSX_MAIN_NS}" xmlns:r="{_XLSX_REL_NS}"><sheets>'
+            + ''.join(
+                f'<sheet name={quoteattr(title)} sheetId="{i}" r:id="rId{i}"/>'
+                for i, title in zip(sheet_ids, self._sheet_titles)
+            )
+            + '</sheets></workbook>'
+        )
+        workbook_rels = (
+            _XML_DECLARATION
+            + f'<Relationships xmlns="{_XLSX_PKG_REL_NS}">'
+            + ''.join(
+                f'<Relationship Id="rId{i}" Type="{_XLSX_REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                for i in sheet_ids
+            )
+            + f'<Relationship Id="rId{styles_rel_id}" Type="{_XLSX_REL_NS}/styles" Target="styles.xml"/>'
+            + f'<Relationship Id="rId{shared_strings_rel_id}" Type="{_XLSX_REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+            + '</Relationships>'
+        )
+
+        try:
+            # Cada hoja se arma una sola vez, copiando su fragmento entre el
+            # inicio y el cierre del XML
+            for sheet_id, title in zip(sheet_ids, self._sheet_titles):
+                fragment, _ = self._sheets[title]
+                fragment.seek(0)
+                with self._zip.open(self._data_part(f'xl/worksheets/sheet{sheet_id}.xml'), 'w') as sheet:
+                    sheet.write(_SHEET_START.encode('utf-8'))
+                    shutil.copyfileobj(fragment, sheet, _OUTPUT_BUFFER_SIZE)
+                    sheet.write(_SHEET_END.encode('utf-8'))
+            self._close_fragments()
+
+            self._zip.writestr('[Content_Types].xml', content_types)
+            self._zip.writestr('_rels/.rels', _ROOT_RELS)
+            self._zip.writestr('xl/workbook.xml', workbook)
+            self._zip.writestr('xl/_rels/workbook.xml.rels', workbook_rels)
+            self._zip.writestr('xl/styles.xml', _STYLES_XML)
+            # La tabla se escribe al final, cuando ya se conocen todos los textos;
+            # los diccionarios conservan el orden de inserción, que es el de los índices
+            with self._zip.open(self._data_part('xl/sharedStrings.xml'), 'w') as shared:
+                shared.write((
+                    _XML_DECLARATION
+                    + f'<sst xmlns="{_XLSX_MAIN_NS}" count="{self._string_count}" '
+                    + f'uniqueCount="{len(self._shared_strings)}">'
+                ).encode('utf-8'))
+                for text in self._shared_strings:
+                    shared.write(f'<si><t xml:space="preserve">{text.translate(_XML_ESCAPE)}</t></si>'.encode('utf-8'))
+                shared.write(b'</sst>')
+            self._zip.close()
+            self._file.close()
+            # El reporte completo reemplaza al anterior en una sola operación
+            os.replace(self._tmp_path, self.excel_path)
+            self._zip = None
+        except Exception:
+            self.discard()
+            raise
 
 def create_excel_template(current_path: str, name_report: str = "report") -> Path:
     """
@@ -24,56 +405,31 @@ def create_excel_template(current_path: str, name_report: str = "report") -> Pat
         Path: Ruta al archivo Excel creado si se creó exitosamente
         None: Si el archivo ya existía
     """
-    # Configuramos logging para seguimiento del proceso
-    logging.basicConfig(level=logging.INFO, 
-                       format='%(asctime)s - %(message)s')
-    
     try:
         # Creamos la ruta completa para el archivo
         excel_path = Path(current_path) / f'{name_report}.xlsx'
         
         # Verificamos si el archivo ya existe
         if excel_path.exists():
-            logging.info(f"El archivo {excel_path} ya existe. No se creará uno nuevo.")
+            logger.info(f"El archivo {excel_path} ya existe. No se creará uno nuevo.")
             return excel_path
         
-        # Si no existe, procedemos a crear el archivo
-        wb = Workbook()
-        ws = wb.active
-        ws.title = name_report
-        
-        # Definimos los encabezados de las columnas
-        headers = [
-            "Identificación",
-            "Nombre",
-            "Fecha de Emisión",
-            "Fecha de Expiración",
-            "error_message"
-        ]
+        # Si no existe, procedemos a crear el archivo. Un libro de solo
+        # escritura va directo al XML sin mantener la grilla de celdas en memoria
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(name_report)
         
         # Aplicamos los encabezados y el formato
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col)
-            cell.value = header
-            # Aplicamos estilo al encabezado
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.fill = PatternFill(start_color="0066CC",
-                                  end_color="0066CC",
-                                  fill_type="solid")
-        
-        # Ajustamos el ancho de las columnas
-        for col in ws.columns:
-            max_length = max(len(str(cell.value)) for cell in col)
-            ws.column_dimensions[col[0].column_letter].width = max_length + 2
+        _write_headers(ws)
         
         # Guardamos el archivo
-        wb.save(str(excel_path))
-        logging.info(f"Archivo Excel creado exitosamente en: {excel_path}")
+        wb.save(excel_path)
+        logger.info(f"Archivo Excel creado exitosamente en: {excel_path}")
         
         return excel_path
     
     except Exception as e:
-        logging.error(f"Error al crear el archivo Excel: {str(e)}")
+        logger.error(f"Error al crear el archivo Excel: {str(e)}")
         raise
 
 def insert_certificate_data(excel_path: Path, data: dict) -> None:
@@ -82,9 +438,8 @@ def insert_certificate_data(excel_path: Path, data: dict) -> None:
     
     Esta función realiza lo siguiente:
     1. Carga el archivo Excel existente
-    2. Encuentra la última fila con datos
-    3. Inserta los nuevos datos en las filas siguientes
-    4. Guarda los cambios en el archivo
+    2. Agrega los nuevos datos como una fila al final de la hoja
+    3. Guarda los cambios en el archivo
     
     Args:
         excel_path: Ruta al archivo Excel
@@ -94,30 +449,110 @@ def insert_certificate_data(excel_path: Path, data: dict) -> None:
     """
     try:
         # Cargamos el archivo Excel existente
-        wb = load_workbook(str(excel_path))
+        wb = load_workbook(excel_path)
         ws = wb.active
         
-        # Encontramos la última fila con datos
-        last_row = ws.max_row + 1
-        
         # Insertamos los nuevos datos
         if not data.get('issue_date'):
-            # Insertamos cada campo en su columna correspondiente
-            ws.cell(row=last_row, column=1, value=data.get('identification', ''))
-            ws.cell(row=last_row, column=2, value=data.get('name', ''))
-            ws.cell(row=last_row, column=3, value=data.get('issue_date', ''))
-            ws.cell(row=last_row, column=4, value=data.get('expiration_date', ''))
-            ws.cell(row=last_row, column=5, value=data.get('error_message', ''))
+            # Agregamos la fila completa, cada campo en su columna correspondiente
+            ws.append((
+                data.get('identification', ''),
+                data.get('name', ''),
+                data.get('issue_date', ''),
+                data.get('expiration_date', ''),
+                data.get('error_message', '')
+            ))
 
             # Guardamos los cambios
-            wb.save(str(excel_path))
-            logging.info(f"Datos insertados exitosamente en {excel_path}")
+            wb.save(excel_path)
+            logger.info(f"Datos insertados exitosamente en {excel_path}")
         
     except Exception as e:
-        logging.error(f"Error al insertar datos en el Excel: {str(e)}")
+        logger.error(f"Error al insertar datos en el Excel: {str(e)}")
         raise
 
+def _report_row(data: dict) -> tuple:
+    """
+    Convierte el diccionario de un certificado en los valores de una fila
+    del reporte, en el orden de HEADERS.
+    """
+    return (
+        data.get('identification', ''),
+        data.get('name', ''),
+        data.get('issue_date', ''),
+        data.get('expiration_date', ''),
+        data.get('message_error', '')
+    )
+
+class ReportWriter:
+    """
+    Reporte consolidado con una hoja por carpeta, escrito en una sola pasada.
+
+    Se abre una vez al comenzar el procesamiento y cada carpeta agrega su hoja
+    con add_folder apenas termina; las filas se convierten a XML en ese momento,
+    así que no hace falta conservarlas hasta el final. El archivo se arma y se
+    guarda una sola vez al salir del bloque with, también si el procesamiento
+    se interrumpe por una excepción. Si ninguna carpeta agregó filas no se
+    crea el archivo.
+
+        with ReportWriter(path) as reporte:
+            reporte.add_folder(nombre_carpeta, filas)
+    """
+
+    def __init__(self, excel_path: Path, fast: bool = False):
+        self.excel_path = Path(excel_path)
+        self._report = StreamingXlsxReport(self.excel_path, fast=fast)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def add_folder(self, folder: str, rows: list) -> None:
+        """
+        Agrega la hoja de una carpeta. Las carpetas sin filas no tienen hoja.
+
+        Args:
+            folder: Nombre de la carpeta; las carpetas con el mismo nombre
+                  reciben hojas distintas
+            rows: Lista de diccionarios que pueden contener: identification,
+                  name, issue_date, expiration_date, message_error
+        """
+        if rows:
+            self._report.add_sheet(folder, map(_report_row, rows))
+
+    def discard(self) -> None:
+        """
+        Descarta el reporte sin crear ni modificar el archivo.
+        """
+        self._report.discard()
+
+    def close(self) -> Path:
+        """
+        Guarda el reporte si tiene al menos una hoja; si no, lo descarta.
+
+        Returns:
+            Path: Ruta al archivo Excel creado, o None si no había filas
+        """
+        sheet_count = len(self._report.sheet_titles)
+        if not sheet_count:
+            self._report.discard()
+            return None
+
+        try:
+            self._report.close()
+        except Exception as e:
+            logger.error(f"Error al crear el reporte consolidado: {str(e)}")
+            raise
+
+        logger.info(f"Reporte consolidado con {sheet_count} hojas creado en: {self.excel_path}")
+        return self.excel_path
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
     # Ruta donde se guardará el Excel
     current_path = "/home/desarrollo/Documents/wc/processing-certificates/certificates/1"
     
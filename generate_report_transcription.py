@@ -5,27 +5,35 @@ NUEVA FUNCIONALIDAD: Manejo de PDFs multipágina con separación automática
 """
 
 import os
+import asyncio
+import functools
+import hashlib
+import threading
 import logging
 import json
+import re
 import base64
 import time
 import fitz
 import pytesseract
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Tuple, NamedTuple
 from PIL import Image
 from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
 from docx import Document
 from dotenv import load_dotenv
-import google.generativeai as genai
-from openai import OpenAI, RateLimitError, APIConnectionError, Timeout, OpenAIError
-import anthropic
-from datetime import datetime
+from datetime import datetime, timedelta
 import shutil
 
+from utils import calcular_hash_archivo, CacheResultados, reducir_pdf
+
 # Cargar variables de entorno
 load_dotenv()
 
@@ -35,14 +43,57 @@ load_dotenv()
 # Cambia esta variable para usar el modelo que prefieras:
 # Opciones: "openai", "anthropic", "gemini"
 DEFAULT_MODEL = "gemini"  # ← CAMBIA AQUÍ EL MODELO POR DEFECTO
+
+# Versión concreta de cada proveedor. Se usan los modelos rápidos de cada uno,
+# suficientes para extraer un JSON de campos fijos; se pueden cambiar con
+# variables de entorno
+OPENAI_MODEL = os.getenv('OPENAI_REPORT_MODEL', 'gpt-4o-mini')
+ANTHROPIC_MODEL = os.getenv('ANTHROPIC_REPORT_MODEL', 'claude-haiku-4-5')
+GEMINI_MODEL = os.getenv('GEMINI_REPORT_MODEL', 'gemini-1.5-flash-8b')
+# Límite de tokens de la respuesta: el JSON del certificado no pasa de ~400
+MAX_OUTPUT_TOKENS = 512
+
+# Procesar los archivos de cada carpeta en un solo lote con la Batch API de
+# OpenAI: más barato y con una sola solicitud por carpeta, pero el lote puede
+# tardar hasta 24 horas en completarse
+USE_BATCH_API = False
+# Segundos entre consultas del estado de un lote
+BATCH_POLL_INTERVAL = 30
+# Máximo de archivos de una carpeta procesados a la vez (solicitudes en curso al modelo)
+MAX_CONCURRENT_REQUESTS = 8
+# Guardar en disco cada página de los PDFs multipágina (carpeta
+# <nombre>_paginas_separadas). Las páginas se procesan en memoria desde el PDF
+# original; los archivos solo sirven para revisarlas
+SAVE_SPLIT_PAGES = False
+# Directorio donde se guardan las respuestas ya obtenidas del modelo, por
+# contenido del certificado. Borrarlo obliga a consultar de nuevo
+RESULT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', '.cert_cache')
+# Ignorar los resultados guardados y volver a extraer todo (se siguen guardando)
+FORCE_REFRESH = os.getenv('FORCE_REFRESH', '').lower() in ('1', 'true', 'si', 'sí')
 # =============================================================================
 
 # Configuración de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Separadores y encabezados de los banners del log, formateados una sola vez
+_BANNER = "=" * 80
+
 logger.info(f"🤖 Modelo configurado por defecto: {DEFAULT_MODEL.upper()}")
 
+# Estilos del reporte Excel, creados una sola vez y compartidos por todas las celdas
+_TITLE_FONT = Font(bold=True, size=14, color="FFFFFF")
+_TITLE_FILL = PatternFill(start_color="1565C0", end_color="1565C0", fill_type="solid")
+_HEADER_FONT = Font(bold=True, color="FFFFFF")
+_HEADER_FILL = PatternFill(start_color="2E86AB", end_color="2E86AB", fill_type="solid")
+_ALIGN_CENTER = Alignment(horizontal="center", vertical="center")
+# Relleno de la celda de estado según la vigencia del certificado
+_STATUS_FILLS = {
+    "VENCIDO": PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid"),
+    "POR VENCER": PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid"),
+    "VIGENTE": PatternFill(start_color="C8E6C9", end_color="C8E6C9", fill_type="solid"),
+}
+
 class ArchivoProhibido(Enum):
     """Enum para extensiones de archivos prohibidos"""
     INI = '.ini'
@@ -51,6 +102,13 @@ class ArchivoProhibido(Enum):
     BAK = '.bak'
     TMP = '.tmp'
 
+# Se calculan una sola vez al importar el módulo
+_EXTENSIONES_PROHIBIDAS = frozenset(ext.value for ext in ArchivoProhibido)
+
+# Extensiones de cada tipo de documento, para elegir cómo se extrae
+_WORD_SUFFIXES = frozenset({'.docx', '.doc'})
+_IMAGE_SUFFIXES = frozenset({'.jpg', '.jpeg', '.png'})
+
 class InferenceError(Exception):
     """Clase personalizada para errores de inferencia"""
     pass
@@ -59,118 +117,129 @@ class ResponseParsingError(Exception):
     """Clase personalizada para errores de parsing de respuesta"""
     pass
 
+# Esquema compacto del prompt: campo -> pista de una línea. Las palabras
+# clave de cada campo van juntas en "synonyms" para no repetir instrucciones
+_PROMPT_SCHEMA = {
+    "certificate_name": "nombre del curso o certificado",
+    "participant_name": "nombres y apellidos completos",
+    "identification": "solo dígitos, sin puntos ni espacios",
+    "institution": "organización emisora, nombre completo",
+    "city": "ciudad de emisión",
+    "issue_date": "fecha de emisión ISO",
+    "expiration_date": "fecha de vencimiento ISO",
+    "hours": "número de horas (número)",
+    "target_audience": "perfil profesional, ej. Médico, Enfermero",
+    "specialization_area": "área médica; inferir del curso",
+    "level": "Básico|Intermedio|Avanzado|Especializado; inferir del curso",
+    "guidelines": "AHA, ILCOR, ACC, ESC u otra sociedad",
+    "instructor": "instructor principal o firmante",
+    "institution_nit": "NIT de la institución",
+    "synonyms": {
+        "certificate_name": ["CERTIFICA", "CURSO DE", "CERTIFICADO EN", "DIPLOMA DE", "ENTRENAMIENTO EN"],
+        "participant_name": ["CERTIFICA QUE", "OTORGADO A", "NOMBRE:", "PARTICIPANTE:"],
+        "identification": ["C.C.", "CC", "Cédula", "C.I.", "DNI"],
+        "institution": ["INSTITUTO", "FUNDACIÓN", "UNIVERSIDAD", "CENTRO", "ACADEMIA"],
+        "issue_date": ["Realizado", "Expedido", "Emitido", "Fecha"],
+        "expiration_date": ["válido hasta", "vigencia", "vence", "expira"],
+        "hours": ["horas", "hrs", "h"],
+        "target_audience": ["Para:", "Dirigido a:"],
+        "institution_nit": ["NIT"]
+    }
+}
+
+
+def _build_prompt(schema: dict) -> str:
+    """Instrucciones del modelo seguidas del esquema de campos a extraer"""
+    return (
+        "Extrae de este certificado (texto de OCR, sé tolerante con errores) estos campos. "
+        "Devuelve SOLO JSON con todas las claves excepto synonyms (palabras clave de apoyo); null si no se encuentra. "
+        "Fechas en ISO 'YYYY-MM-DDTHH:MM:SS.sssZ'; la expiración se calcula desde la emisión si solo hay vigencia.\n"
+        + json.dumps(schema, ensure_ascii=False)
+    )
+
+# Campos con formato fijo que se buscan en la transcripción con expresiones
+# regulares antes de llamar al modelo. Estos valores reemplazan la respuesta
+# del modelo, así que solo se aceptan formas inequívocas: "C.C."/"C.I." en
+# mayúsculas con sus puntos (un "cc" suelto del OCR no cuenta) y "horas"/"hrs"
+# completos, no una "h" aislada
+_RE_IDENTIFICATION = re.compile(
+    r'(?:\bC\.\s?[CI]\.|\b(?i:c[ée]dula(?:\s+de\s+ciudadan[íi]a)?|dni)\b\.?)'
+    r'\s*(?i:No\.?|N[°º]\.?)?\s*[:\-]?\s*(\d[\d.]{4,14}\d)'
+)
+_RE_NIT = re.compile(r'\bNIT\b\.?\s*(?:No\.?)?\s*[:\-]?\s*(\d[\d.]{5,14}\d(?:\s?-\s?\d)?)', re.I)
+_RE_HOURS = re.compile(r'\b(\d{1,4})\s*(?:horas?|hrs?)\b', re.I)
+_REGULAR_FIELDS = ('identification', 'institution_nit', 'hours')
+
+def _extract_regular_fields(transcription: str) -> dict:
+    """
+    Busca en la transcripción los campos con formato fijo (identificación,
+    NIT e intensidad horaria). Devuelve solo los que encuentra.
+    """
+    fields = {}
+    if not transcription:
+        return fields
+    match = _RE_IDENTIFICATION.search(transcription)
+    if match:
+        fields['identification'] = match.group(1).replace('.', '')
+    match = _RE_NIT.search(transcription)
+    if match:
+        fields['institution_nit'] = re.sub(r'[.\s]', '', match.group(1))
+    match = _RE_HOURS.search(transcription)
+    if match:
+        fields['hours'] = int(match.group(1))
+    return fields
+
+# Esquema sin los campos que ya se obtuvieron localmente
+_PROMPT_SCHEMA_SHORT = {
+    field: hint for field, hint in _PROMPT_SCHEMA.items() if field not in _REGULAR_FIELDS
+}
+_PROMPT_SCHEMA_SHORT["synonyms"] = {
+    field: words for field, words in _PROMPT_SCHEMA["synonyms"].items() if field not in _REGULAR_FIELDS
+}
+
+# Decodificador de parse_response: raw_decode parte de una posición dada y se
+# detiene al cerrar el objeto, sin buscar el último '}' de la respuesta
+_JSON_DECODER = json.JSONDecoder()
+
+def _first_json_object(text: str) -> Optional[Any]:
+    """Primer objeto JSON válido del texto, probando desde cada '{', o None si no hay"""
+    start = text.find('{')
+    while start != -1:
+        try:
+            return _JSON_DECODER.raw_decode(text, start)[0]
+        except json.JSONDecodeError:
+            start = text.find('{', start + 1)
+    return None
+
+# Campos obligatorios de la respuesta con sus valores por defecto (solo lectura)
+_REQUIRED_FIELDS = MappingProxyType({
+    'certificate_name': None,
+    'participant_name': None,
+    'identification': None,
+    'institution': None,
+    'city': None,
+    'issue_date': None,
+    'expiration_date': None,
+    'hours': None,
+    'target_audience': None,
+    'specialization_area': None,
+    'level': None,
+    'guidelines': None,
+    'instructor': None,
+    'institution_nit': None,
+    'message_error': None
+})
+
 class BaseInferenceReport(ABC):
     """
     Clase base abstracta para extracción de información completa de certificados.
     Extrae todos los campos necesarios para el reporte completo.
     """
     def __init__(self):
-        self.prompt = """Tu tarea es extraer información específica y completa de certificados escaneados, siendo especialmente flexible con variaciones en el texto debido a OCR.
-
-INSTRUCCIONES DE EXTRACCIÓN - TODOS LOS CAMPOS OBLIGATORIOS:
-
-1. NOMBRE DEL CERTIFICADO/CURSO:
-   - Busca el nombre completo del certificado o curso
-   - Palabras clave: 'CERTIFICA', 'CURSO DE', 'CERTIFICADO EN', 'DIPLOMA DE', 'ENTRENAMIENTO EN'
-   - Ejemplo: "SOPORTE VITAL BASICO Y AVANZADO", "ACLS", "REANIMACION PEDIATRICA"
-   - Si no se encuentra: null
-
-2. NOMBRE COMPLETO DEL PARTICIPANTE:
-   - Busca el nombre después de: 'CERTIFICA QUE', 'OTORGADO A', 'NOMBRE:', 'PARTICIPANTE:'
-   - Incluye nombres y apellidos completos
-   - Limpia caracteres especiales del OCR
-   - Si no se encuentra: null
-
-3. IDENTIFICACIÓN:
-   - Busca números precedidos por: 'C.C.', 'CC', 'Cédula', 'C.I.', 'DNI'
-   - Extrae solo números, sin puntos ni espacios
-   - Si no se encuentra: null
-
-4. INSTITUCIÓN:
-   - Busca nombre de la institución emisora
-   - Palabras clave: 'INSTITUTO', 'FUNDACIÓN', 'UNIVERSIDAD', 'CENTRO', 'ACADEMIA'
-   - Incluye nombre completo de la organización
-   - Si no se encuentra: null
-
-5. CIUDAD:
-   - Busca ubicación geográfica
-   - Palabras clave: 'CIUDAD DE', 'EN', ubicaciones después de fechas
-   - Ejemplos: "Bogotá", "Barranquilla", "Medellín"
-   - Si no se encuentra: null
-
-6. FECHA DE EMISIÓN:
-   - Busca patrones de fecha con palabras clave: 'Realizado', 'Expedido', 'Emitido', 'Fecha'
-   - Formatos: "DD de MM de YYYY", "DD/MM/YYYY", "MM-DD-YYYY"
-   - Convierte a formato ISO: "YYYY-MM-DDTHH:MM:SS.sssZ"
-   - Si no se encuentra: null
-
-7. FECHA DE EXPIRACIÓN:
-   - Busca: 'válido hasta', 'vigencia', 'vence', 'expira'
-   - Si encuentra vigencia en años/meses/días: calcula desde fecha de emisión
-   - Convierte a formato ISO: "YYYY-MM-DDTHH:MM:SS.sssZ"
-   - Si no se encuentra: null
-
-8. INTENSIDAD HORARIA:
-   - Busca números seguidos de: 'horas', 'hrs', 'h'
-   - Extrae solo el número
-   - Ejemplos: "48 horas" → 48, "16 hrs" → 16
-   - Si no se encuentra: null
-
-9. DIRIGIDO A (PERFIL PROFESIONAL):
-   - Busca: 'Para:', 'Dirigido a:', profesiones mencionadas
-   - Ejemplos: "Médico", "Enfermero", "Paramédico", "Personal de salud"
-   - Si no se encuentra: null
-
-10. ÁREA DE ESPECIALIZACIÓN:
-    - Identifica el área médica basada en el contenido
-    - Ejemplos: "Cardiología", "Pediatría", "Emergencias", "Trasplantes", "Cirugía"
-    - Inferir del nombre del curso si no está explícito
-    - Si no se encuentra: null
-
-CAMPOS ADICIONALES OPCIONALES:
-
-11. NIVEL DEL CURSO:
-    - Busca: 'Básico', 'Avanzado', 'Intermedio', 'Especializado'
-    - Inferir del nombre si no está explícito
-    - Si no se encuentra: null
-
-12. LINEAMIENTOS/ESTÁNDARES:
-    - Busca: 'AHA', 'ILCOR', 'ACC', 'ESC', menciones de sociedades científicas
-    - Si no se encuentra: null
-
-13. INSTRUCTOR PRINCIPAL:
-    - Busca nombres en secciones de firmas o instructores
-    - Si no se encuentra: null
-
-14. NIT DE INSTITUCIÓN:
-    - Busca números precedidos por 'NIT', 'NIT:', 'Nit'
-    - Si no se encuentra: null
-
-FORMATO DE SALIDA OBLIGATORIO:
-{
-    "certificate_name": string | null,
-    "participant_name": string | null,
-    "identification": string | null,
-    "institution": string | null,
-    "city": string | null,
-    "issue_date": "YYYY-MM-DDTHH:MM:SS.sssZ" | null,
-    "expiration_date": "YYYY-MM-DDTHH:MM:SS.sssZ" | null,
-    "hours": number | null,
-    "target_audience": string | null,
-    "specialization_area": string | null,
-    "level": string | null,
-    "guidelines": string | null,
-    "instructor": string | null,
-    "institution_nit": string | null
-}
-
-REGLAS IMPORTANTES:
-- TODOS los campos deben aparecer en la respuesta, aunque sean null
-- Sé muy tolerante con errores de OCR
-- Busca patrones aproximados cuando el texto esté distorsionado
-- NO agregues campos adicionales no solicitados
-- NO incluyas explicaciones, solo el JSON
-- Si un campo no se puede determinar con certeza, asigna null"""
+        self.prompt = _build_prompt(_PROMPT_SCHEMA)
+        # Prompt para transcripciones en las que ya se encontraron los campos
+        # de _REGULAR_FIELDS: el modelo solo extrae el resto
+        self.short_prompt = _build_prompt(_PROMPT_SCHEMA_SHORT)
 
     def parse_response(self, response_text: str) -> dict:
         """
@@ -178,40 +247,12 @@ REGLAS IMPORTANTES:
         """
         try:
             # Extraer JSON de la respuesta
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
-            
-            if start_idx == -1 or end_idx == -1:
+            data = _first_json_object(response_text)
+            if not isinstance(data, dict):
                 raise ResponseParsingError("No se encontró una estructura JSON válida en la respuesta")
             
-            json_str = response_text[start_idx:end_idx + 1]
-            data = json.loads(json_str)
-            
-            # Campos obligatorios con valores por defecto
-            required_fields = {
-                'certificate_name': None,
-                'participant_name': None,
-                'identification': None,
-                'institution': None,
-                'city': None,
-                'issue_date': None,
-                'expiration_date': None,
-                'hours': None,
-                'target_audience': None,
-                'specialization_area': None,
-                'level': None,
-                'guidelines': None,
-                'instructor': None,
-                'institution_nit': None,
-                'message_error': None
-            }
-            
             # Asegurar que todos los campos estén presentes
-            for field in required_fields:
-                if field not in data:
-                    data[field] = required_fields[field]
-            
-            return data
+            return {**_REQUIRED_FIELDS, **data}
         
         except json.JSONDecodeError as e:
             logger.error(f"Error al decodificar JSON: {str(e)}")
@@ -226,109 +267,299 @@ REGLAS IMPORTANTES:
         """Método abstracto para obtener inferencias"""
         pass
 
+    async def get_inference_async(self, *args, **kwargs):
+        """
+        Versión asíncrona de get_inference. Por defecto ejecuta get_inference
+        en un hilo; las subclases con cliente asíncrono la sobrescriben.
+        """
+        return await asyncio.to_thread(self.get_inference, *args, **kwargs)
+
+# Clientes HTTP compartidos por los SDK de OpenAI y Anthropic: un solo pool
+# de conexiones, así las solicitudes reutilizan las conexiones TLS abiertas
+_HTTP_CLIENT = None
+_ASYNC_HTTP_CLIENT = None
+_MAX_KEEPALIVE_CONNECTIONS = 32
+
+def _http_clients():
+    """Devuelve (cliente, cliente_asíncrono) de httpx, creándolos la primera vez"""
+    global _HTTP_CLIENT, _ASYNC_HTTP_CLIENT
+    if _HTTP_CLIENT is None:
+        import httpx
+        limits = httpx.Limits(max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS)
+        _HTTP_CLIENT = httpx.Client(limits=limits, follow_redirects=True)
+        _ASYNC_HTTP_CLIENT = httpx.AsyncClient(limits=limits, follow_redirects=True)
+    return _HTTP_CLIENT, _ASYNC_HTTP_CLIENT
+
 class OpenAIInferenceReport(BaseInferenceReport):
     """Clase para manejar inferencia con OpenAI para reportes completos"""
     
     def __init__(self):
         super().__init__()
+        # Los SDK se importan al crear el modelo: solo se cargan los que se usan
+        import openai
+        http_client, async_http_client = _http_clients()
         self.api_key = os.getenv('API_OPENAI')
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = openai.OpenAI(api_key=self.api_key, http_client=http_client)
+        self.async_client = openai.AsyncOpenAI(api_key=self.api_key, http_client=async_http_client)
+        self.api_errors = (openai.RateLimitError, openai.APIConnectionError, openai.Timeout, openai.OpenAIError)
+
+    def _completion_params(self, content_certificate, prompt=None) -> dict:
+        """Parámetros de la solicitud, comunes a get_inference y get_inference_async"""
+        # Respuesta en streaming: los fragmentos se reciben a medida que se
+        # generan, sin esperar a que el modelo termine toda la respuesta.
+        # El prompt va primero y sin cambios entre solicitudes para que OpenAI
+        # lo reutilice de su caché de prefijos; el texto del certificado va aparte
+        return {
+            "model": OPENAI_MODEL,
+            "messages": [
+                {"role": "system", "content": prompt or self.prompt},
+                {"role": "user", "content": content_certificate}
+            ],
+            "temperature": 0.1,
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            # Modo JSON: el modelo devuelve solo el objeto, sin bloques de markdown
+            "response_format": {"type": "json_object"},
+            "stream": True
+        }
 
-    def get_inference(self, content_certificate, path_pdf=None):
+    def _batch_body(self, content_certificate) -> dict:
+        """Cuerpo de una solicitud de la Batch API: igual que la normal, sin streaming"""
+        body = self._completion_params(content_certificate)
+        del body["stream"]
+        return body
+
+    def _certificate_info(self, buffer: list) -> dict:
+        """Une los fragmentos recibidos y procesa la respuesta"""
+        response_text = "".join(buffer)
+        if not response_text:
+            raise Exception("La API no devolvió ninguna respuesta")
+        return self.parse_response(response_text)
+
+    def get_inference(self, content_certificate, path_pdf=None, prompt=None):
         try:
-            completion = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": self.prompt},
-                    {"role": "user", "content": content_certificate}
-                ],
-                temperature=0.1
-            )
+            stream = self.client.chat.completions.create(**self._completion_params(content_certificate, prompt))
             
-            response_text = completion.choices[0].message.content
-            if not response_text:
-                raise Exception("La API no devolvió ninguna respuesta")
+            buffer = []
+            for chunk in stream:
+                if chunk.choices:
+                    buffer.append(chunk.choices[0].delta.content or "")
             
-            certificate_info = self.parse_response(response_text)
-            return certificate_info
+            return self._certificate_info(buffer)
+            
+        except self.api_errors as e:
+            logger.error(f"Error en API de OpenAI: {str(e)}")
+            raise InferenceError(f"Error en OpenAI: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error inesperado: {str(e)}")
+            raise InferenceError(f"Error inesperado: {str(e)}")
+
+    async def get_inference_async(self, content_certificate, path_pdf=None, prompt=None):
+        try:
+            stream = await self.async_client.chat.completions.create(**self._completion_params(content_certificate, prompt))
             
-        except (RateLimitError, APIConnectionError, Timeout, OpenAIError) as e:
+            buffer = []
+            async for chunk in stream:
+                if chunk.choices:
+                    buffer.append(chunk.choices[0].delta.content or "")
+            
+            return self._certificate_info(buffer)
+            
+        except self.api_errors as e:
             logger.error(f"Error en API de OpenAI: {str(e)}")
             raise InferenceError(f"Error en OpenAI: {str(e)}")
         except Exception as e:
             logger.error(f"Error inesperado: {str(e)}")
             raise InferenceError(f"Error inesperado: {str(e)}")
 
+    def get_batch_inference(self, contents: dict) -> dict:
+        """
+        Obtiene la información de varios certificados con un solo lote de la
+        Batch API de OpenAI. Espera (consultando cada BATCH_POLL_INTERVAL
+        segundos) hasta que el lote termine.
+
+        Args:
+            contents: Diccionario {custom_id: texto del certificado}
+
+        Returns:
+            dict: {custom_id: info_certificado}, o la excepción InferenceError
+            de las solicitudes que fallaron
+        """
+        try:
+            # Una línea JSONL por certificado, con los mismos parámetros que get_inference
+            lines = [
+                json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._batch_body(content)
+                }, ensure_ascii=False)
+                for custom_id, content in contents.items()
+            ]
+            batch_file = self.client.files.create(
+                file=("certificados.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info(f"📦 Lote {batch.id} enviado con {len(lines)} certificados")
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(BATCH_POLL_INTERVAL)
+                batch = self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed":
+                raise InferenceError(f"El lote {batch.id} terminó con estado: {batch.status}")
+
+            results = {}
+            if batch.output_file_id:
+                for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    custom_id = item["custom_id"]
+                    response = item.get("response") or {}
+                    if item.get("error") or response.get("status_code") != 200:
+                        results[custom_id] = InferenceError(f"Error en OpenAI: {item.get('error') or response.get('body')}")
+                        continue
+                    try:
+                        response_text = response["body"]["choices"][0]["message"]["content"]
+                        if not response_text:
+                            raise InferenceError("La API no devolvió ninguna respuesta")
+                        results[custom_id] = self.parse_response(response_text)
+                    except Exception as e:
+                        results[custom_id] = InferenceError(f"Error inesperado: {str(e)}")
+
+            # Las solicitudes que no aparecen en la salida fallaron dentro del lote
+            for custom_id in contents:
+                results.setdefault(custom_id, InferenceError("La solicitud no se completó en el lote"))
+
+            return results
+
+        except InferenceError:
+            raise
+        except self.api_errors as e:
+            logger.error(f"Error en Batch API de OpenAI: {str(e)}")
+            raise InferenceError(f"Error en OpenAI: {str(e)}")
+
+# Tamaño de bloque al codificar PDFs en base64 (múltiplo de 3)
+_PDF_READ_CHUNK = 3 * 1024 * 64
+
 class AntropicInferenceReport(BaseInferenceReport):
     """Clase para manejar inferencia con Claude para reportes completos"""
     
     def __init__(self):
         super().__init__()
+        import anthropic
+        http_client, async_http_client = _http_clients()
         self.api_key = os.getenv('ANTHROPIC_API_KEY')
-        self.client = anthropic.Anthropic(api_key=self.api_key)
-        self.model = "claude-3-5-sonnet-20241022"
+        self.client = anthropic.Anthropic(api_key=self.api_key, http_client=http_client)
+        self.async_client = anthropic.AsyncAnthropic(api_key=self.api_key, http_client=async_http_client)
+        self.api_error = anthropic.APIError
+        self.model = ANTHROPIC_MODEL
 
     def read_pdf(self, path_pdf):
+        """
+        Devuelve el PDF codificado en base64. Se lee por bloques (múltiplos de
+        3 bytes, así cada bloque se codifica sin relleno intermedio) para no
+        tener en memoria el archivo completo además de su codificación.
+        path_pdf también puede ser el contenido del PDF en bytes.
+
+        Los PDFs escaneados pesados se envían reducidos (ver reducir_pdf).
+        """
         try:
+            reduced = reducir_pdf(path_pdf)
+            if reduced is not None:
+                return base64.b64encode(reduced).decode("ascii")
+            if isinstance(path_pdf, bytes):
+                # PDF ya en memoria (página de un PDF multipágina)
+                return base64.b64encode(path_pdf).decode("ascii")
+            encoded = bytearray()
             with open(path_pdf, "rb") as f:
-                pdf_data = base64.b64encode(f.read()).decode("utf-8")
-            return pdf_data
+                while chunk := f.read(_PDF_READ_CHUNK):
+                    encoded += base64.b64encode(chunk)
+            return encoded.decode("ascii")
         except FileNotFoundError:
             raise InferenceError("El archivo PDF no se encontró")
     
-    def get_inference(self, content_certificate=None, path_pdf=None):
+    def _message_params(self, content_certificate=None, path_pdf=None, prompt=None) -> dict:
+        """Parámetros de la solicitud, comunes a get_inference y get_inference_async"""
+        if path_pdf:
+            # Usar PDF directamente con Claude
+            content_pdf = self.read_pdf(path_pdf)
+            content = [
+                {
+                    "type": "document",
+                    "source": {
+                        "type": "base64",
+                        "media_type": "application/pdf",
+                        "data": content_pdf
+                    }
+                }
+            ]
+        else:
+            # Usar texto extraído
+            content = [
+                {
+                    "type": "text",
+                    "text": f"Texto del certificado:\n{content_certificate}"
+                }
+            ]
+
+        return {
+            "model": self.model,
+            "max_tokens": MAX_OUTPUT_TOKENS,
+            # Las instrucciones son iguales en todas las solicitudes: van en el
+            # system marcadas para la caché de prompts, así no se vuelven a
+            # procesar (ni a cobrar completas) en cada certificado
+            "system": [
+                {
+                    "type": "text",
+                    "text": prompt or self.prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }
+            ],
+            "messages": [{"role": "user", "content": content}]
+        }
+
+    def _certificate_info(self, text_response: str) -> dict:
+        """Procesa el texto completo de la respuesta"""
+        # Claude a veces envuelve el JSON en texto o en un bloque de código
+        response_dict = _first_json_object(text_response)
+        if not isinstance(response_dict, dict):
+            raise ResponseParsingError("No se encontró una estructura JSON válida en la respuesta")
+        response_dict['message_error'] = None
+        return response_dict
+
+    def get_inference(self, content_certificate=None, path_pdf=None, prompt=None):
         try:
-            if path_pdf:
-                # Usar PDF directamente con Claude
-                content_pdf = self.read_pdf(path_pdf)
-                message = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=2048,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "document",
-                                    "source": {
-                                        "type": "base64",
-                                        "media_type": "application/pdf",
-                                        "data": content_pdf
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": self.prompt
-                                }
-                            ]
-                        }
-                    ]
-                )
-            else:
-                # Usar texto extraído
-                message = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=2048,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "text",
-                                    "text": f"{self.prompt}\n\nTexto del certificado:\n{content_certificate}"
-                                }
-                            ]
-                        }
-                    ]
-                )
-            
-            text_response = message.content[0]
-            response_dict = json.loads(text_response.text)
-            response_dict['message_error'] = None
-            
-            return response_dict
-
-        except anthropic.APIError as e:
+            # Acumulamos el texto a medida que llega en streaming
+            with self.client.messages.stream(**self._message_params(content_certificate, path_pdf, prompt)) as message_stream:
+                text_response = "".join(message_stream.text_stream)
+            
+            return self._certificate_info(text_response)
+
+        except self.api_error as e:
+            error_message = f"Error en la API de Anthropic: {str(e)}"
+            logger.error(error_message)
+            raise InferenceError(error_message)
+        except Exception as e:
+            error_message = f"Error inesperado en Claude: {str(e)}"
+            logger.error(error_message)
+            raise InferenceError(error_message)
+
+    async def get_inference_async(self, content_certificate=None, path_pdf=None, prompt=None):
+        try:
+            # Reducir el PDF rasteriza sus páginas: se hace fuera del event loop
+            params = await asyncio.to_thread(self._message_params, content_certificate, path_pdf, prompt)
+            async with self.async_client.messages.stream(**params) as message_stream:
+                text_response = "".join([text async for text in message_stream.text_stream])
+            
+            return self._certificate_info(text_response)
+
+        except self.api_error as e:
             error_message = f"Error en la API de Anthropic: {str(e)}"
             logger.error(error_message)
             raise InferenceError(error_message)
@@ -342,26 +573,50 @@ class GeminiInferenceReport(BaseInferenceReport):
     
     def __init__(self):
         super().__init__()
+        import google.generativeai as genai
         self.api_key = os.getenv('GEMINI_API')
         genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = genai.GenerativeModel(
+            GEMINI_MODEL,
+            generation_config={"max_output_tokens": MAX_OUTPUT_TOKENS}
+        )
         
-    def get_inference(self, content_certificate=None, path_file=None):
+    def _contents(self, content_certificate=None, path_file=None, prompt=None):
+        """Contenido de la solicitud, común a get_inference y get_inference_async"""
+        prompt = prompt or self.prompt
+        if path_file and Path(path_file).suffix.lower() in _IMAGE_SUFFIXES:
+            # Procesar imagen
+            return [prompt, Image.open(path_file)]
+        # Procesar texto extraído
+        return f"{prompt}\n\nTexto del certificado:\n{content_certificate}"
+
+    def _certificate_info(self, response_text: str) -> dict:
+        """Procesa el texto completo de la respuesta"""
+        if response_text:
+            return self.parse_response(response_text)
+        raise InferenceError("No se generó respuesta de texto")
+
+    def get_inference(self, content_certificate=None, path_file=None, prompt=None):
         try:
-            if path_file and Path(path_file).suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                # Procesar imagen
-                image = Image.open(path_file)
-                response = self.model.generate_content([self.prompt, image])
-                response.resolve()
-            else:
-                # Procesar texto extraído
-                response = self.model.generate_content(f"{self.prompt}\n\nTexto del certificado:\n{content_certificate}")
-                response.resolve()
+            response = self.model.generate_content(self._contents(content_certificate, path_file, prompt), stream=True)
 
-            if response.text:
-                return self.parse_response(response.text)
-            else:
-                raise InferenceError("No se generó respuesta de texto")
+            # Acumulamos los fragmentos a medida que llegan en streaming
+            response_text = "".join(chunk.text for chunk in response)
+            return self._certificate_info(response_text)
+
+        except FileNotFoundError:
+            raise InferenceError("El archivo no se encontró")
+        except Exception as e:
+            raise InferenceError(f"Error en Gemini: {str(e)}")
+
+    async def get_inference_async(self, content_certificate=None, path_file=None, prompt=None):
+        try:
+            response = await self.model.generate_content_async(
+                self._contents(content_certificate, path_file, prompt), stream=True
+            )
+
+            response_text = "".join([chunk.text async for chunk in response])
+            return self._certificate_info(response_text)
 
         except FileNotFoundError:
             raise InferenceError("El archivo no se encontró")
@@ -371,36 +626,127 @@ class GeminiInferenceReport(BaseInferenceReport):
 class ModelFactory:
     """Factory para crear instancias de modelos según la configuración"""
     
+    # Una sola instancia por clase de modelo (y por lo tanto un solo cliente
+    # del SDK) en todo el proceso
+    _instances = {}
+    
+    @classmethod
+    def shared(cls, model_class):
+        """Devuelve la instancia compartida de la clase de modelo, creándola la primera vez"""
+        instance = cls._instances.get(model_class)
+        if instance is None:
+            instance = cls._instances[model_class] = model_class()
+        return instance
+    
     @staticmethod
     def create_model(model_name: str):
         """Crea una instancia del modelo especificado"""
         model_name = model_name.lower()
         
         if model_name == "openai":
-            logger.info("🔷 Usando modelo OpenAI (GPT-3.5-turbo)")
-            return OpenAIInferenceReport()
+            logger.info(f"🔷 Usando modelo OpenAI ({OPENAI_MODEL})")
+            return ModelFactory.shared(OpenAIInferenceReport)
         elif model_name == "anthropic":
-            logger.info("🟡 Usando modelo Anthropic (Claude 3.5 Sonnet)")
-            return AntropicInferenceReport()
+            logger.info(f"🟡 Usando modelo Anthropic ({ANTHROPIC_MODEL})")
+            return ModelFactory.shared(AntropicInferenceReport)
         elif model_name == "gemini":
-            logger.info("🔵 Usando modelo Google Gemini (1.5 Flash)")
-            return GeminiInferenceReport()
+            logger.info(f"🔵 Usando modelo Google Gemini ({GEMINI_MODEL})")
+            return ModelFactory.shared(GeminiInferenceReport)
         else:
             logger.warning(f"Modelo '{model_name}' no reconocido. Usando OpenAI por defecto.")
-            return OpenAIInferenceReport()
+            return ModelFactory.shared(OpenAIInferenceReport)
+
+class PdfPage(NamedTuple):
+    """
+    Página de un PDF multipágina que se procesa en memoria, sin escribirla a
+    disco. path es la ruta que tendría el archivo de la página separada: se
+    usa como nombre en el reporte (os.path.basename funciona sobre la página).
+    """
+    pdf_path: str
+    page_index: int
+    path: str
+
+    def __fspath__(self) -> str:
+        return self.path
+
+class ExtractionResult(NamedTuple):
+    """
+    Resultado de procesar un archivo. Los errores esperados (del modelo, del
+    OCR, de parsing) llegan como error en lugar de relanzarse como excepción
+    hasta la escritura del Excel.
+    """
+    certificate_info: Optional[dict]
+    transcription: str
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @classmethod
+    def failed(cls, error) -> 'ExtractionResult':
+        return cls(None, f"Error al procesar: {str(error)}", str(error))
 
 class PDFSplitter:
     """🆕 NUEVA CLASE: Maneja la separación de PDFs multipágina"""
     
+    # Máximo de documentos que se mantienen abiertos entre el conteo de
+    # páginas y la separación u OCR del mismo archivo
+    MAX_OPEN_DOCUMENTS = 32
+    
     def __init__(self):
-        pass
+        self._documents = {}
+        # Número de páginas ya conocido por (ruta, fecha de modificación)
+        self._page_counts = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _page_count_key(file_path: str) -> tuple:
+        return os.path.normpath(file_path), os.stat(file_path).st_mtime_ns
+    
+    def take_document(self, file_path: str) -> fitz.Document:
+        """
+        Devuelve el documento ya abierto para la ruta, o lo abre si no lo está.
+        Quien lo toma pasa a ser su dueño y debe cerrarlo.
+        """
+        with self._lock:
+            pdf_document = self._documents.pop(os.path.normpath(file_path), None)
+        return pdf_document if pdf_document is not None else fitz.open(file_path)
+    
+    def keep_document(self, file_path: str, pdf_document: fitz.Document) -> None:
+        """
+        Deja el documento abierto para el siguiente take_document, si hay
+        espacio y no hay ya otro abierto para la misma ruta
+        """
+        key = os.path.normpath(file_path)
+        with self._lock:
+            if key not in self._documents and len(self._documents) < self.MAX_OPEN_DOCUMENTS:
+                self._documents[key] = pdf_document
+                return
+        pdf_document.close()
+    
+    def close_documents(self) -> None:
+        """Cierra los documentos que quedaron abiertos sin usarse"""
+        with self._lock:
+            documents = list(self._documents.values())
+            self._documents.clear()
+        for pdf_document in documents:
+            pdf_document.close()
     
     def get_pdf_page_count(self, file_path: str) -> int:
-        """Obtiene el número de páginas de un PDF"""
+        """
+        Obtiene el número de páginas de un PDF. El documento queda abierto
+        para que la separación o el OCR no vuelvan a leer su estructura.
+        """
         try:
-            pdf_document = fitz.open(file_path)
-            page_count = pdf_document.page_count
-            pdf_document.close()
+            key = self._page_count_key(file_path)
+            page_count = self._page_counts.get(key)
+            if page_count is not None:
+                return page_count
+            
+            pdf_document = self.take_document(file_path)
+            page_count = self._page_counts[key] = pdf_document.page_count
+            self.keep_document(file_path, pdf_document)
             return page_count
         except Exception as e:
             logger.error(f"Error obteniendo número de páginas de {file_path}: {str(e)}")
@@ -421,8 +767,8 @@ class PDFSplitter:
             # Crear directorio de salida si no existe
             os.makedirs(output_directory, exist_ok=True)
             
-            # Abrir PDF original
-            pdf_document = fitz.open(pdf_path)
+            # Abrir PDF original (normalmente ya abierto al contar sus páginas)
+            pdf_document = self.take_document(pdf_path)
             
             # Obtener nombre base del archivo
             base_name = Path(pdf_path).stem
@@ -432,20 +778,21 @@ class PDFSplitter:
             
             # Separar cada página
             for page_num in range(pdf_document.page_count):
-                # Crear nuevo PDF con una sola página
-                new_pdf = fitz.open()
-                new_pdf.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
-                
                 # Nombre del archivo de la página
                 page_filename = f"{base_name}_pagina_{page_num + 1:02d}.pdf"
                 page_path = os.path.join(output_directory, page_filename)
                 
-                # Guardar página
-                new_pdf.save(page_path)
-                new_pdf.close()
+                # Crear nuevo PDF con una sola página y guardarlo. insert_pdf
+                # copia los streams ya comprimidos del original, así que no se
+                # recomprime nada ni se recolectan objetos: el archivo es temporal
+                with fitz.open() as new_pdf:
+                    new_pdf.insert_pdf(pdf_document, from_page=page_num, to_page=page_num)
+                    new_pdf.save(page_path, garbage=0, deflate=False, deflate_images=False, deflate_fonts=False)
+                # Cada archivo creado tiene una página: no hace falta abrirlo para contarlas
+                self._page_counts[self._page_count_key(page_path)] = 1
                 
                 created_files.append(page_path)
-                logger.info(f"   ✅ Página {page_num + 1} guardada como: {page_filename}")
+                logger.info("   ✅ Página %d guardada como: %s", page_num + 1, page_filename)
             
             pdf_document.close()
             
@@ -456,6 +803,146 @@ class PDFSplitter:
             logger.error(f"❌ Error separando PDF {pdf_path}: {str(e)}")
             return False, []
 
+# Pool de procesos para el OCR de las páginas de un PDF; se crea la primera
+# vez que se necesita y lo comparten todos los hilos de extracción
+_OCR_POOL = None
+_OCR_POOL_LOCK = threading.Lock()
+# Solo el motor LSTM de Tesseract: no carga ni evalúa el motor heredado
+_TESSERACT_CONFIG = '--oem 1'
+# Las páginas se renderizan en escala de grises a 1.5x (~108 DPI); solo las
+# que dan menos de _OCR_MIN_CHARS caracteres se repiten a 2.5x
+_OCR_ZOOM = 1.5
+_OCR_RETRY_ZOOM = 2.5
+_OCR_MIN_CHARS = 50
+
+def _init_ocr_worker():
+    """
+    Inicializa cada proceso del pool de OCR. El paralelismo lo da el pool, así
+    que cada tesseract usa un solo hilo de OpenMP: varios procesos con todos
+    los hilos cada uno compiten por los núcleos y el conjunto va más lento.
+    """
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+def _ocr_pool() -> ProcessPoolExecutor:
+    """Devuelve el pool de OCR del módulo, creándolo la primera vez"""
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is None:
+            _OCR_POOL = ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_ocr_worker)
+        return _OCR_POOL
+
+def _ocr_page_image(image: tuple) -> str:
+    """OCR de una página renderizada (se ejecuta en el pool de OCR)"""
+    width, height, samples = image
+    img = Image.frombytes("L", (width, height), samples)
+    return pytesseract.image_to_string(img, config=_TESSERACT_CONFIG)
+
+def _render_page(page, zoom: float) -> Optional[tuple]:
+    """
+    Renderiza una página en escala de grises; None si falla. Devuelve los
+    píxeles sin comprimir (ancho, alto, bytes): codificarlos como PNG o JPEG
+    solo para decodificarlos en el proceso de OCR cuesta más que enviarlos.
+    """
+    try:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+        return pix.width, pix.height, pix.samples
+    except Exception as e:
+        logger.error(f"Error procesando página: {str(e)}")
+        return None
+
+def _ocr_document_pages(file, page_indexes) -> str:
+    """
+    Texto de las páginas indicadas de un documento abierto. Las páginas con
+    capa de texto (PDF digital) se leen directamente; solo las escaneadas, con
+    imágenes y sin texto, pasan por OCR. Las que casi no dan texto con OCR se
+    repiten a mayor resolución.
+    """
+    page_indexes = list(page_indexes)
+    texts = []
+    scanned = []
+    for position, index in enumerate(page_indexes):
+        page = file[index]
+        text = page.get_text("text")
+        if len(text.strip()) < _OCR_MIN_CHARS and page.get_images():
+            scanned.append(position)
+        texts.append(text)
+
+    images = [_render_page(file[page_indexes[position]], _OCR_ZOOM) for position in scanned]
+    for position, text in zip(scanned, _ocr_images(images)):
+        texts[position] = text
+
+    retry = [position for position, image in zip(scanned, images)
+             if image is not None and len(texts[position].strip()) < _OCR_MIN_CHARS]
+    if retry:
+        retry_texts = _ocr_images([_render_page(file[page_indexes[position]], _OCR_RETRY_ZOOM)
+                                   for position in retry])
+        for position, text in zip(retry, retry_texts):
+            if len(text.strip()) > len(texts[position].strip()):
+                texts[position] = text
+
+    return "\n".join(text for text in texts if text).strip()
+
+def _ocr_images(images: list) -> list:
+    """
+    OCR de varias páginas renderizadas. Una sola página se procesa aquí mismo
+    (no compensa el envío al pool); varias, en paralelo en el pool de OCR.
+    Las páginas sin imagen o que fallan dan texto vacío.
+    """
+    if len(images) == 1:
+        futures = [None]
+    else:
+        futures = [_ocr_pool().submit(_ocr_page_image, image) if image is not None else None
+                   for image in images]
+
+    texts = []
+    for image, future in zip(images, futures):
+        try:
+            if image is None:
+                texts.append("")
+            else:
+                texts.append(future.result() if future is not None else _ocr_page_image(image))
+        except Exception as e:
+            logger.error(f"Error procesando página: {str(e)}")
+            texts.append("")
+    return texts
+
+class EmptyDocumentError(InferenceError):
+    """El documento no tiene texto (ni capa de texto ni resultado de OCR)"""
+    pass
+
+def _require_text(transcription: str) -> None:
+    """Evita llamar al modelo (y a los de respaldo) con un documento sin texto"""
+    if not transcription or not transcription.strip():
+        raise EmptyDocumentError("No se encontró texto en el documento")
+
+def _cached_extraction(extract):
+    """
+    Decorador de extract_content y extract_content_async: guarda en disco el
+    resultado (info_certificado, transcripcion) por contenido del archivo, así
+    un archivo sin cambios no vuelve a pasar por OCR ni por el modelo.
+    """
+    if asyncio.iscoroutinefunction(extract):
+        @functools.wraps(extract)
+        async def wrapper(self, file_path):
+            # El hash lee el archivo completo: se calcula en un hilo
+            key = await asyncio.to_thread(self._extraction_key, file_path)
+            result = self._load_extraction(key)
+            if result is None:
+                result = await extract(self, file_path)
+                self.extraction_cache.set(key, list(result))
+            return result
+        return wrapper
+
+    @functools.wraps(extract)
+    def wrapper(self, file_path):
+        key = self._extraction_key(file_path)
+        result = self._load_extraction(key)
+        if result is None:
+            result = extract(self, file_path)
+            self.extraction_cache.set(key, list(result))
+        return result
+    return wrapper
+
 class DocumentExtractorReport:
     """Extractor unificado para documentos con reporte completo - MEJORADO para manejar PDFs multipágina"""
     
@@ -463,44 +950,170 @@ class DocumentExtractorReport:
         # Crear modelo principal según configuración
         self.ia_inference = ModelFactory.create_model(DEFAULT_MODEL)
         
-        # Crear modelos de respaldo para casos específicos
-        self.fallback_models = {
-            "openai": OpenAIInferenceReport(),
-            "anthropic": AntropicInferenceReport(),
-            "gemini": GeminiInferenceReport()
+        # 🆕 NUEVA FUNCIONALIDAD: Inicializar splitter de PDFs
+        self.pdf_splitter = PDFSplitter()
+
+        # Respuestas ya obtenidas: un certificado sin cambios no vuelve al modelo
+        self.cache = CacheResultados(RESULT_CACHE_DIR)
+        # Extracciones completas por archivo (ver _cached_extraction)
+        self.extraction_cache = CacheResultados(os.path.join(RESULT_CACHE_DIR, 'extracciones'))
+        # Hash del contenido por (ruta, mtime, tamaño) (ver _file_hash)
+        self._file_hashes = {}
+
+    @functools.cached_property
+    def fallback_models(self) -> dict:
+        """
+        Modelos de respaldo para casos específicos, sin el modelo principal.
+        Se crean la primera vez que se necesitan: en una ejecución sin errores
+        ni imágenes no se importan ni autentican sus SDK.
+        """
+        fallback_models = {
+            "openai": OpenAIInferenceReport,
+            "anthropic": AntropicInferenceReport,
+            "gemini": GeminiInferenceReport
         }
         
         # Remover el modelo principal de los fallbacks
-        if DEFAULT_MODEL in self.fallback_models:
-            del self.fallback_models[DEFAULT_MODEL]
-        
-        # 🆕 NUEVA FUNCIONALIDAD: Inicializar splitter de PDFs
-        self.pdf_splitter = PDFSplitter()
+        fallback_models.pop(DEFAULT_MODEL, None)
+        return {name: ModelFactory.shared(model_class) for name, model_class in fallback_models.items()}
+
+    def _gemini_model(self) -> BaseInferenceReport:
+        """Modelo Gemini para imágenes: el principal si es Gemini, si no el de respaldo"""
+        if isinstance(self.ia_inference, GeminiInferenceReport):
+            return self.ia_inference
+        return self.fallback_models["gemini"]
+
+    def _cache_key(self, model: BaseInferenceReport, content: str, prompt: str = None) -> str:
+        """
+        Clave de caché de una consulta: depende del modelo, del prompt y del
+        contenido enviado (la transcripción, o el hash del archivo cuando el
+        modelo recibe el archivo directamente).
+        """
+        key = hashlib.sha256()
+        for part in (type(model).__name__, prompt or model.prompt, content):
+            key.update(part.encode('utf-8'))
+            key.update(b'\0')
+        return key.hexdigest()
+
+    def _file_hash(self, file_path: str) -> str:
+        """
+        Hash SHA-256 del archivo, leído una sola vez mientras no cambie. Lo
+        piden la clave de la extracción y la de la inferencia, y en un PDF
+        multipágina cada una de sus páginas: sin esto el archivo completo se
+        volvería a leer en cada caso.
+        """
+        stat = os.stat(file_path)
+        key = (os.path.normpath(file_path), stat.st_mtime_ns, stat.st_size)
+        file_hash = self._file_hashes.get(key)
+        if file_hash is None:
+            file_hash = self._file_hashes[key] = calcular_hash_archivo(file_path)
+        return file_hash
+
+    def _extraction_key(self, file_path) -> str:
+        """Clave de la extracción de un archivo (o de una página de un PDF) según su contenido"""
+        if isinstance(file_path, PdfPage):
+            content = f"{self._file_hash(file_path.pdf_path)}:{file_path.page_index}"
+        else:
+            content = self._file_hash(str(file_path))
+        return self._cache_key(self.ia_inference, content)
+
+    def _load_extraction(self, key: str) -> Optional[tuple]:
+        """Extracción guardada para la clave, o None si no hay (o si FORCE_REFRESH)"""
+        if FORCE_REFRESH:
+            return None
+        result = self.extraction_cache.get(key)
+        if result is None:
+            return None
+        logger.info("💾 Extracción tomada de la caché")
+        return tuple(result)
+
+    def _cached_inference(self, model: BaseInferenceReport, content: str, *args, **kwargs) -> dict:
+        """Llama a model.get_inference(*args, **kwargs) salvo que la respuesta ya esté en caché"""
+        key = self._cache_key(model, content, kwargs.get('prompt'))
+        certificate_info = None if FORCE_REFRESH else self.cache.get(key)
+        if certificate_info is not None:
+            logger.info("💾 Respuesta tomada de la caché")
+            return certificate_info
+        certificate_info = model.get_inference(*args, **kwargs)
+        self.cache.set(key, certificate_info)
+        return certificate_info
+
+    async def _cached_inference_async(self, model: BaseInferenceReport, content: str, *args, **kwargs) -> dict:
+        """Versión asíncrona de _cached_inference"""
+        key = self._cache_key(model, content, kwargs.get('prompt'))
+        certificate_info = None if FORCE_REFRESH else self.cache.get(key)
+        if certificate_info is not None:
+            logger.info("💾 Respuesta tomada de la caché")
+            return certificate_info
+        certificate_info = await model.get_inference_async(*args, **kwargs)
+        self.cache.set(key, certificate_info)
+        return certificate_info
+
+    def _infer_transcription(self, model: BaseInferenceReport, transcription: str, *args) -> dict:
+        """
+        Obtiene la información de una transcripción. Si los campos de formato
+        fijo se encuentran con expresiones regulares, el modelo solo extrae
+        el resto (prompt más corto y menos tokens de respuesta).
+        """
+        _require_text(transcription)
+        regular_fields = _extract_regular_fields(transcription)
+        if len(regular_fields) < len(_REGULAR_FIELDS):
+            return self._cached_inference(model, transcription, transcription, *args)
+        certificate_info = self._cached_inference(
+            model, transcription, transcription, *args, prompt=model.short_prompt)
+        return {**certificate_info, **regular_fields}
+
+    async def _infer_transcription_async(self, model: BaseInferenceReport, transcription: str, *args) -> dict:
+        """Versión asíncrona de _infer_transcription"""
+        _require_text(transcription)
+        regular_fields = _extract_regular_fields(transcription)
+        if len(regular_fields) < len(_REGULAR_FIELDS):
+            return await self._cached_inference_async(model, transcription, transcription, *args)
+        certificate_info = await self._cached_inference_async(
+            model, transcription, transcription, *args, prompt=model.short_prompt)
+        return {**certificate_info, **regular_fields}
 
     def extract_pdf_content(self, file_path):
-        """Extrae contenido de PDF usando OCR"""
+        """
+        Extrae contenido de PDF usando OCR.
+        Las páginas se renderizan en una sola pasada y, si hay más de
+        una, el OCR de cada página corre en paralelo en el pool de OCR. Las
+        páginas que casi no dan texto se repiten a mayor resolución.
+        """
         try:
-            file = fitz.open(file_path)
-            full_text = ""
-            
-            for page in file:
-                try:
-                    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                    text = pytesseract.image_to_string(img)
-                    full_text += text + "\n"
-                    time.sleep(0.1)
-                except Exception as e:
-                    logger.error(f"Error procesando página: {str(e)}")
-                    continue
-            
-            file.close()
-            return full_text.strip()
+            with self.pdf_splitter.take_document(file_path) as file:
+                return _ocr_document_pages(file, range(file.page_count))
             
         except Exception as e:
             logger.error(f"Error extrayendo PDF: {str(e)}")
             raise InferenceError(f"Error extrayendo PDF: {str(e)}")
 
+    def extract_pdf_page_content(self, page: PdfPage) -> str:
+        """
+        Extrae con OCR una página de un PDF multipágina, desde el PDF original.
+        El documento se devuelve abierto al splitter para la página siguiente.
+        """
+        try:
+            file = self.pdf_splitter.take_document(page.pdf_path)
+            try:
+                return _ocr_document_pages(file, [page.page_index])
+            finally:
+                self.pdf_splitter.keep_document(page.pdf_path, file)
+            
+        except Exception as e:
+            logger.error(f"Error extrayendo página de PDF: {str(e)}")
+            raise InferenceError(f"Error extrayendo página de PDF: {str(e)}")
+
+    def pdf_page_bytes(self, page: PdfPage) -> bytes:
+        """Contenido de un PDF de una sola página, generado en memoria (para Claude)"""
+        file = self.pdf_splitter.take_document(page.pdf_path)
+        try:
+            with fitz.open() as page_pdf:
+                page_pdf.insert_pdf(file, from_page=page.page_index, to_page=page.page_index)
+                return page_pdf.tobytes(garbage=0, deflate=False)
+        finally:
+            self.pdf_splitter.keep_document(page.pdf_path, file)
+
     def extract_docx_content(self, file_path):
         """Extrae contenido de documento Word"""
         try:
@@ -531,6 +1144,7 @@ class DocumentExtractorReport:
         page_count = self.pdf_splitter.get_pdf_page_count(file_path)
         return page_count > 1
 
+    @_cached_extraction
     def extract_content(self, file_path: str) -> tuple:
         """
         Extrae contenido y obtiene información del certificado
@@ -538,37 +1152,42 @@ class DocumentExtractorReport:
         
         Retorna: (info_certificado, transcripcion_completa)
         """
+        # Sin comprobar exists(): _cached_extraction ya hizo os.stat del
+        # archivo al calcular su hash, y un archivo inexistente levantó ahí
+        # FileNotFoundError
         file_path = Path(file_path)
-        
-        if not file_path.exists():
-            raise FileNotFoundError(f"El archivo {file_path} no existe")
 
         try:
             transcription = ""
             certificate_info = {}
             
-            if file_path.suffix.lower() == '.pdf':
+            suffix = file_path.suffix.lower()
+            if suffix == '.pdf':
                 if DEFAULT_MODEL == "anthropic":
                     # Claude puede procesar PDFs directamente
-                    certificate_info = self.ia_inference.get_inference(path_pdf=str(file_path))
+                    certificate_info = self._cached_inference(
+                        self.ia_inference, self._file_hash(str(file_path)), path_pdf=str(file_path))
                     transcription = "PDF procesado directamente por Claude"
                 else:
                     # Para otros modelos, extraer texto primero
                     transcription = self.extract_pdf_content(str(file_path))
-                    certificate_info = self.ia_inference.get_inference(transcription, str(file_path))
+                    certificate_info = self._infer_transcription(self.ia_inference, transcription, str(file_path))
                 
-            elif file_path.suffix.lower() in ['.docx', '.doc']:
+            elif suffix in _WORD_SUFFIXES:
                 transcription = self.extract_docx_content(str(file_path))
-                certificate_info = self.ia_inference.get_inference(transcription)
+                certificate_info = self._infer_transcription(self.ia_inference, transcription)
                 
-            elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png']:
+            elif suffix in _IMAGE_SUFFIXES:
                 if DEFAULT_MODEL == "gemini":
                     # Gemini puede procesar imágenes directamente
-                    certificate_info = self.ia_inference.get_inference(path_file=str(file_path))
+                    certificate_info = self._cached_inference(
+                        self.ia_inference, self._file_hash(str(file_path)), path_file=str(file_path))
                     transcription = f"Imagen procesada directamente por Gemini: {file_path.name}"
                 else:
                     # Para otros modelos, usar Gemini como fallback para imágenes
-                    certificate_info = self.fallback_models.get("gemini", GeminiInferenceReport()).get_inference(path_file=str(file_path))
+                    certificate_info = self._cached_inference(
+                        self._gemini_model(),
+                        self._file_hash(str(file_path)), path_file=str(file_path))
                     transcription = f"Imagen procesada por Gemini (fallback): {file_path.name}"
                 
             else:
@@ -578,53 +1197,361 @@ class DocumentExtractorReport:
 
         except Exception as e:
             logger.error(f"Error procesando {file_path}: {str(e)}")
+            if isinstance(e, EmptyDocumentError):
+                raise
             
             # Intentar con modelo de respaldo si está disponible
-            if self.fallback_models:
-                logger.info("Intentando con modelo de respaldo...")
-                try:
-                    fallback_model = next(iter(self.fallback_models.values()))
-                    if file_path.suffix.lower() == '.pdf':
-                        transcription = self.extract_pdf_content(str(file_path))
-                        certificate_info = fallback_model.get_inference(transcription)
-                    elif file_path.suffix.lower() in ['.docx', '.doc']:
-                        transcription = self.extract_docx_content(str(file_path))
-                        certificate_info = fallback_model.get_inference(transcription)
-                    elif file_path.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                        certificate_info = self.fallback_models.get("gemini", GeminiInferenceReport()).get_inference(path_file=str(file_path))
-                        transcription = f"Imagen procesada por modelo de respaldo: {file_path.name}"
-                    
-                    logger.info("Éxito con modelo de respaldo")
-                    return certificate_info, transcription
-                except Exception as fallback_error:
-                    logger.error(f"Error también en modelo de respaldo: {fallback_error}")
+            result = self._extract_with_fallback(file_path, transcription)
+            if result is not None:
+                return result
+            
+            raise
+
+    def _extract_with_fallback(self, file_path: Path, transcription: Optional[str] = None):
+        """
+        Intenta extraer el archivo con el modelo de respaldo. Si ya se obtuvo
+        la transcripción antes de que fallara el modelo principal, se reutiliza
+        en lugar de repetir el OCR o la lectura del documento.
+        
+        Retorna: (info_certificado, transcripcion_completa), o None si no hay
+        modelo de respaldo o también falla
+        """
+        if not self.fallback_models:
+            return None
+        
+        logger.info("Intentando con modelo de respaldo...")
+        certificate_info = {}
+        try:
+            fallback_model = next(iter(self.fallback_models.values()))
+            suffix = file_path.suffix.lower()
+            if suffix == '.pdf':
+                transcription = transcription or self.extract_pdf_content(str(file_path))
+                certificate_info = fallback_model.get_inference(transcription)
+            elif suffix in _WORD_SUFFIXES:
+                transcription = transcription or self.extract_docx_content(str(file_path))
+                certificate_info = fallback_model.get_inference(transcription)
+            elif suffix in _IMAGE_SUFFIXES:
+                certificate_info = self._gemini_model().get_inference(path_file=str(file_path))
+                transcription = f"Imagen procesada por modelo de respaldo: {file_path.name}"
+            
+            logger.info("Éxito con modelo de respaldo")
+            return certificate_info, transcription
+        except Exception as fallback_error:
+            logger.error(f"Error también en modelo de respaldo: {fallback_error}")
+            return None
+
+    async def extract_page_async(self, page: PdfPage) -> tuple:
+        """
+        Extrae la información de una página de un PDF multipágina sin leer
+        ningún archivo de página separada: el OCR se hace sobre el PDF
+        original y a Claude se le envía un PDF de una página creado en memoria.
+        
+        Retorna: (info_certificado, transcripcion_completa)
+        """
+        transcription = None
+        try:
+            if DEFAULT_MODEL == "anthropic":
+                page_bytes = await asyncio.to_thread(self.pdf_page_bytes, page)
+                certificate_info = await self._cached_inference_async(
+                    self.ia_inference, hashlib.sha256(page_bytes).hexdigest(), path_pdf=page_bytes)
+                return certificate_info, "PDF procesado directamente por Claude"
             
+            transcription = await asyncio.to_thread(self.extract_pdf_page_content, page)
+            certificate_info = await self._infer_transcription_async(self.ia_inference, transcription)
+            return certificate_info, transcription
+
+        except Exception as e:
+            logger.error(f"Error procesando {page.path}: {str(e)}")
+            if not self.fallback_models or isinstance(e, EmptyDocumentError):
+                raise
+            
+            logger.info("Intentando con modelo de respaldo...")
+            try:
+                # El OCR de la página se reutiliza si ya se hizo antes del error
+                if not transcription:
+                    transcription = await asyncio.to_thread(self.extract_pdf_page_content, page)
+                fallback_model = next(iter(self.fallback_models.values()))
+                certificate_info = await fallback_model.get_inference_async(transcription)
+                logger.info("Éxito con modelo de respaldo")
+                return certificate_info, transcription
+            except Exception as fallback_error:
+                logger.error(f"Error también en modelo de respaldo: {fallback_error}")
             raise
 
+    @_cached_extraction
+    async def extract_content_async(self, file_path: str) -> tuple:
+        """
+        Versión asíncrona de extract_content: la solicitud al modelo usa su
+        cliente asíncrono y el OCR corre en un hilo, así que varios archivos
+        pueden procesarse a la vez (ver process_tasks). Acepta también páginas
+        de PDFs multipágina (PdfPage).
+        
+        Retorna: (info_certificado, transcripcion_completa)
+        """
+        if isinstance(file_path, PdfPage):
+            return await self.extract_page_async(file_path)
+        
+        # La existencia del archivo ya se verificó con el os.stat del hash
+        file_path = Path(file_path)
+
+        try:
+            transcription = ""
+            certificate_info = {}
+            
+            suffix = file_path.suffix.lower()
+            if suffix == '.pdf':
+                if DEFAULT_MODEL == "anthropic":
+                    # Claude puede procesar PDFs directamente
+                    certificate_info = await self._cached_inference_async(
+                        self.ia_inference, self._file_hash(str(file_path)), path_pdf=str(file_path))
+                    transcription = "PDF procesado directamente por Claude"
+                else:
+                    # Para otros modelos, extraer texto primero
+                    transcription = await asyncio.to_thread(self.extract_pdf_content, str(file_path))
+                    certificate_info = await self._infer_transcription_async(self.ia_inference, transcription, str(file_path))
+                
+            elif suffix in _WORD_SUFFIXES:
+                transcription = await asyncio.to_thread(self.extract_docx_content, str(file_path))
+                certificate_info = await self._infer_transcription_async(self.ia_inference, transcription)
+                
+            elif suffix in _IMAGE_SUFFIXES:
+                if DEFAULT_MODEL == "gemini":
+                    # Gemini puede procesar imágenes directamente
+                    certificate_info = await self._cached_inference_async(
+                        self.ia_inference, self._file_hash(str(file_path)), path_file=str(file_path))
+                    transcription = f"Imagen procesada directamente por Gemini: {file_path.name}"
+                else:
+                    # Para otros modelos, usar Gemini como fallback para imágenes
+                    gemini = self._gemini_model()
+                    certificate_info = await self._cached_inference_async(
+                        gemini, self._file_hash(str(file_path)), path_file=str(file_path))
+                    transcription = f"Imagen procesada por Gemini (fallback): {file_path.name}"
+                
+            else:
+                raise ValueError(f"Formato no soportado: {file_path.suffix}")
+
+            return certificate_info, transcription
+
+        except Exception as e:
+            logger.error(f"Error procesando {file_path}: {str(e)}")
+            if isinstance(e, EmptyDocumentError):
+                raise
+            
+            # El respaldo es poco frecuente: se usa la versión síncrona en un hilo
+            result = await asyncio.to_thread(self._extract_with_fallback, file_path, transcription)
+            if result is not None:
+                return result
+            
+            raise
+
+    def extract_batch(self, file_paths: list) -> dict:
+        """
+        Extrae la información de varios archivos con un solo lote de la Batch
+        API de OpenAI. Solo PDFs y documentos Word van al lote (se envía su
+        transcripción); los demás formatos se procesan uno a uno con extract_content.
+
+        Retorna: {ruta: ExtractionResult}
+        """
+        batch_model = self.ia_inference if isinstance(self.ia_inference, OpenAIInferenceReport) \
+            else self.fallback_models["openai"]
+
+        results = {}
+        transcriptions = {}
+        paths_by_id = {}
+        for index, file_path in enumerate(file_paths):
+            suffix = Path(file_path).suffix.lower()
+            try:
+                if suffix == '.pdf':
+                    transcription = self.extract_pdf_content(str(file_path))
+                elif suffix in _WORD_SUFFIXES:
+                    transcription = self.extract_docx_content(str(file_path))
+                else:
+                    results[file_path] = ExtractionResult(*self.extract_content(file_path))
+                    continue
+            except Exception as e:
+                results[file_path] = ExtractionResult.failed(e)
+                continue
+
+            # El índice evita colisiones entre archivos con el mismo nombre
+            custom_id = f"archivo-{index}"
+            transcriptions[custom_id] = transcription
+            paths_by_id[custom_id] = file_path
+
+        if transcriptions:
+            try:
+                batch_results = batch_model.get_batch_inference(transcriptions)
+            except Exception as e:
+                batch_results = dict.fromkeys(transcriptions, e)
+            for custom_id, file_path in paths_by_id.items():
+                certificate_info = batch_results[custom_id]
+                if isinstance(certificate_info, Exception):
+                    results[file_path] = ExtractionResult.failed(certificate_info)
+                else:
+                    results[file_path] = ExtractionResult(certificate_info, transcriptions[custom_id])
+
+        return results
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso_date(iso_date_str: str) -> datetime:
+    """
+    Convierte una fecha ISO de la respuesta del modelo a datetime. Cada fecha
+    se usa para el estado y para el formato de la fila, así que se memoriza.
+    """
+    return datetime.fromisoformat(iso_date_str.replace('Z', '+00:00'))
+
 class ExcelReportManager:
-    """Gestor para crear y manejar reportes Excel completos"""
+    """
+    Gestor para crear y manejar reportes Excel completos.
+    
+    Cada reporte se abre una sola vez como libro write_only y sus filas se
+    escriben a un archivo temporal a medida que se agregan; el reporte se
+    guarda con save() o al salir del bloque with.
+    """
+    
+    HEADERS = (
+        "Nombre del Archivo",  # Nueva primera columna
+        "Nombre del Certificado",
+        "Nombre Completo", 
+        "Identificación",
+        "Institución",
+        "Ciudad",
+        "Fecha Emisión",
+        "Fecha Expiración",
+        "Estado",
+        "Intensidad (hrs)",
+        "Dirigido a",
+        "Área",
+        "Nivel",
+        "Lineamientos",
+        "Instructor",
+        "NIT Institución",
+        "Transcripción",
+        "Mensaje Error"
+    )
+    # Ancho de cada columna, en el orden de HEADERS
+    COLUMN_WIDTHS = (20, 25, 30, 15, 30, 15, 15, 15, 12, 12, 15, 15, 12, 20, 25, 15, 50, 30)
     
     def __init__(self):
-        self.headers = [
-            "Nombre del Archivo",  # Nueva primera columna
-            "Nombre del Certificado",
-            "Nombre Completo", 
-            "Identificación",
-            "Institución",
-            "Ciudad",
-            "Fecha Emisión",
-            "Fecha Expiración",
-            "Estado",
-            "Intensidad (hrs)",
-            "Dirigido a",
-            "Área",
-            "Nivel",
-            "Lineamientos",
-            "Instructor",
-            "NIT Institución",
-            "Transcripción",
-            "Mensaje Error"
-        ]
+        # Libros abiertos por ruta, pendientes de guardar: (libro, hoja)
+        self._workbooks = {}
+        # Última fila escrita en la hoja de cada libro abierto
+        self._last_rows = {}
+        # Fecha de procesamiento: se toma una sola vez y se usa tanto en el
+        # encabezado del reporte como para calcular el estado de cada certificado
+        self.processing_time = datetime.now().astimezone()
+        # Límites del estado, según si la fecha trae zona horaria (las que no
+        # la traen se comparan con la hora local): (vencido antes de, por
+        # vencer antes de). (exp - now).days <= 30 equivale a exp < now + 31 días
+        naive_time = self.processing_time.replace(tzinfo=None)
+        self._status_limits = {
+            True: (self.processing_time, self.processing_time + timedelta(days=31)),
+            False: (naive_time, naive_time + timedelta(days=31)),
+        }
+        # Estado ya calculado por fecha de expiración
+        self._statuses = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.save_all()
+
+    @staticmethod
+    def _styled_cell(ws, value, font=None, fill=None, alignment=None) -> WriteOnlyCell:
+        """Celda con formato para una hoja en modo write_only"""
+        cell = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        return cell
+
+    def _append_row(self, ws, row_data) -> None:
+        """Agrega una fila de datos, con el relleno del estado (columna 9)"""
+        row_data = list(row_data)
+        status_fill = _STATUS_FILLS.get(row_data[8]) if len(row_data) > 8 else None
+        if status_fill is not None:
+            row_data[8] = self._styled_cell(ws, row_data[8], fill=status_fill)
+        ws.append(row_data)
+
+    def _new_workbook(self, title: str) -> Tuple[Workbook, Any]:
+        """
+        Crea un libro en modo write_only con la fila de título y la de
+        encabezados. Las filas agregadas se escriben a un archivo temporal y
+        no se mantienen en memoria, así que el libro ocupa lo mismo con diez
+        filas que con diez mil.
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Certificaciones")
+        
+        # Anchos, celdas combinadas y filtros se declaran antes de escribir filas
+        for col, width in enumerate(self.COLUMN_WIDTHS, 1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        ws.merged_cells.add('A1:D1')  # Combinar celdas para la fecha
+        ws.auto_filter.ref = f"A2:{get_column_letter(len(self.HEADERS))}2"
+        
+        # Fecha de procesamiento en la primera fila y encabezados en la segunda
+        ws.append([self._styled_cell(ws, title, _TITLE_FONT, _TITLE_FILL, _ALIGN_CENTER)])
+        ws.append([
+            self._styled_cell(ws, header, _HEADER_FONT, _HEADER_FILL, _ALIGN_CENTER)
+            for header in self.HEADERS
+        ])
+        return wb, ws
+
+    def _report_title(self) -> str:
+        """Texto de la primera fila: la fecha de procesamiento"""
+        fecha_procesamiento = self.processing_time.strftime("%d/%m/%Y %H:%M:%S")
+        return f"📅 REPORTE GENERADO EL: {fecha_procesamiento}"
+
+    def _workbook(self, excel_path: Path) -> Tuple[Workbook, Any]:
+        """
+        Devuelve el libro abierto para la ruta, creándolo la primera vez. Un
+        libro write_only no puede cargar un archivo, así que las filas de un
+        reporte existente se copian en el libro nuevo antes de agregar las
+        de esta ejecución.
+        """
+        entry = self._workbooks.get(excel_path)
+        if entry is not None:
+            return entry
+        
+        last_row = 2
+        if excel_path.exists():
+            existing = load_workbook(excel_path, read_only=True)
+            try:
+                rows = existing.active.iter_rows(values_only=True)
+                title_row = next(rows, None)
+                next(rows, None)  # Encabezados: se escriben los actuales
+                wb, ws = self._new_workbook(title_row[0] if title_row else self._report_title())
+                for row_data in rows:
+                    self._append_row(ws, row_data)
+                    last_row += 1
+            finally:
+                existing.close()
+        else:
+            wb, ws = self._new_workbook(self._report_title())
+        
+        entry = self._workbooks[excel_path] = (wb, ws)
+        self._last_rows[excel_path] = last_row
+        return entry
+
+    def save(self, excel_path: Path) -> None:
+        """Guarda el libro de la ruta (si está abierto) y lo libera"""
+        entry = self._workbooks.pop(excel_path, None)
+        self._last_rows.pop(excel_path, None)
+        if entry is not None:
+            wb, _ = entry
+            wb.save(excel_path)
+            logger.info(f"💾 Excel guardado: {excel_path}")
+
+    def save_all(self) -> None:
+        """Guarda todos los libros que siguen abiertos"""
+        for excel_path in list(self._workbooks):
+            try:
+                self.save(excel_path)
+            except Exception as e:
+                logger.error(f"Error guardando Excel {excel_path}: {str(e)}")
 
     def create_excel_template(self, current_path: str, name_report: str = "reporte_certificaciones") -> Path:
         """Crea plantilla Excel con formato profesional incluyendo fecha de procesamiento"""
@@ -635,36 +1562,9 @@ class ExcelReportManager:
                 logger.info(f"Archivo existente encontrado: {excel_path}")
                 return excel_path
             
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Certificaciones"
-            
-            # NUEVA CARACTERÍSTICA: Agregar fecha de procesamiento en la primera fila
-            fecha_procesamiento = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-            ws.merge_cells('A1:D1')  # Combinar celdas para la fecha
-            fecha_cell = ws['A1']
-            fecha_cell.value = f"📅 REPORTE GENERADO EL: {fecha_procesamiento}"
-            fecha_cell.font = Font(bold=True, size=14, color="FFFFFF")
-            fecha_cell.fill = PatternFill(start_color="1565C0", end_color="1565C0", fill_type="solid")
-            fecha_cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Aplicar encabezados con formato en la fila 2
-            for col, header in enumerate(self.headers, 1):
-                cell = ws.cell(row=2, column=col)
-                cell.value = header
-                cell.font = Font(bold=True, color="FFFFFF")
-                cell.fill = PatternFill(start_color="2E86AB", end_color="2E86AB", fill_type="solid")
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Ajustar anchos de columnas (agregando una más para el nombre del archivo)
-            column_widths = [20, 25, 30, 15, 30, 15, 15, 15, 12, 12, 15, 15, 12, 20, 25, 15, 50, 30]
-            for col, width in enumerate(column_widths, 1):
-                ws.column_dimensions[ws.cell(row=2, column=col).column_letter].width = width
-            
-            # Aplicar filtros automáticos (desde la fila 2)
-            ws.auto_filter.ref = f"A2:{ws.cell(row=2, column=len(self.headers)).column_letter}2"
-            
-            wb.save(str(excel_path))
+            # NUEVA CARACTERÍSTICA: fecha de procesamiento en la primera fila
+            wb, _ = self._new_workbook(self._report_title())
+            wb.save(excel_path)
             logger.info(f"Plantilla Excel creada con fecha de procesamiento: {excel_path}")
             
             return excel_path
@@ -674,33 +1574,43 @@ class ExcelReportManager:
             raise
 
     def calculate_status(self, expiration_date_str):
-        """Calcula el estado del certificado basado en fecha de expiración"""
+        """
+        Calcula el estado del certificado basado en fecha de expiración. La
+        fecha de procesamiento es fija, así que el estado de cada fecha se
+        calcula una sola vez.
+        """
         if not expiration_date_str:
             return "Sin fecha"
         
+        status = self._statuses.get(expiration_date_str)
+        if status is not None:
+            return status
+        
         try:
             # Convertir fecha ISO a datetime
-            exp_date = datetime.fromisoformat(expiration_date_str.replace('Z', '+00:00'))
-            now = datetime.now(exp_date.tzinfo)
+            exp_date = _parse_iso_date(expiration_date_str)
+            expired_before, expiring_before = self._status_limits[exp_date.tzinfo is not None]
             
-            if exp_date < now:
-                return "VENCIDO"
-            elif (exp_date - now).days <= 30:
-                return "POR VENCER"
+            if exp_date < expired_before:
+                status = "VENCIDO"
+            elif exp_date < expiring_before:
+                status = "POR VENCER"
             else:
-                return "VIGENTE"
+                status = "VIGENTE"
                 
         except Exception:
-            return "Fecha inválida"
+            status = "Fecha inválida"
+        
+        self._statuses[expiration_date_str] = status
+        return status
 
     def insert_certificate_data(self, excel_path: Path, data: dict, transcription: str, filename: str) -> None:
-        """Inserta datos completos del certificado en Excel incluyendo nombre del archivo"""
+        """
+        Inserta datos completos del certificado en Excel incluyendo nombre del archivo.
+        La fila queda en memoria hasta que se llama a save().
+        """
         try:
-            wb = load_workbook(str(excel_path))
-            ws = wb.active
-            
-            # La primera fila es la fecha, los datos empiezan desde la fila 3
-            last_row = ws.max_row + 1
+            _, ws = self._workbook(excel_path)
             
             # Calcular estado
             status = self.calculate_status(data.get('expiration_date'))
@@ -731,20 +1641,12 @@ class ExcelReportManager:
                 data.get('message_error', '')
             ]
             
-            for col, value in enumerate(row_data, 1):
-                ws.cell(row=last_row, column=col, value=value)
-            
-            # Aplicar formato condicional al estado (columna 9 ahora)
-            status_cell = ws.cell(row=last_row, column=9)
-            if status == "VENCIDO":
-                status_cell.fill = PatternFill(start_color="FFCDD2", end_color="FFCDD2", fill_type="solid")
-            elif status == "POR VENCER":
-                status_cell.fill = PatternFill(start_color="FFF9C4", end_color="FFF9C4", fill_type="solid")
-            elif status == "VIGENTE":
-                status_cell.fill = PatternFill(start_color="C8E6C9", end_color="C8E6C9", fill_type="solid")
+            # La primera fila es la fecha, los datos empiezan desde la fila 3;
+            # el estado (columna 9) lleva su relleno según la vigencia
+            self._append_row(ws, row_data)
+            last_row = self._last_rows[excel_path] = self._last_rows[excel_path] + 1
             
-            wb.save(str(excel_path))
-            logger.info(f"Datos insertados en fila {last_row} para archivo: {filename}")
+            logger.debug("Datos insertados en fila %d para archivo: %s", last_row, filename)
             
         except Exception as e:
             logger.error(f"Error insertando datos en Excel: {str(e)}")
@@ -756,117 +1658,189 @@ class ExcelReportManager:
             return ""
         
         try:
-            date_obj = datetime.fromisoformat(iso_date_str.replace('Z', '+00:00'))
+            date_obj = _parse_iso_date(iso_date_str)
             return date_obj.strftime('%d/%m/%Y')
         except Exception:
             return iso_date_str
 
-def process_single_file(file_path: str, excel_manager: ExcelReportManager, extractor: DocumentExtractorReport, 
-                       excel_path: Path, folder_name: str) -> Tuple[bool, str]:
+def _insert_result(excel_manager: ExcelReportManager, excel_path: Path, file_path: str,
+                   result: ExtractionResult) -> bool:
     """
-    🆕 NUEVA FUNCIÓN: Procesa un archivo individual
-    
+    Inserta en el Excel el resultado de un archivo ya extraído: la fila del
+    certificado, o la fila de error si la extracción falló.
+
     Returns:
-        Tuple[bool, str]: (éxito, mensaje_error)
+        bool: True si se insertó el certificado, False si hubo error
     """
-    try:
-        filename = os.path.basename(file_path)
-        logger.info(f"📄 Procesando archivo: {filename}")
-        
-        # Extraer información y transcripción
-        certificate_info, transcription = extractor.extract_content(file_path)
-        
-        # Insertar en Excel
-        excel_manager.insert_certificate_data(excel_path, certificate_info, transcription, filename)
-        
-        logger.info(f"✅ Éxito: {filename}")
-        return True, ""
-        
-    except Exception as e:
-        error_msg = str(e)
-        logger.error(f"❌ Error procesando {filename}: {error_msg}")
-        
-        # Insertar fila de error
-        error_data = {
-            'certificate_name': '',
-            'message_error': error_msg
-        }
+    filename = os.path.basename(file_path)
+    if result.ok:
         try:
-            excel_manager.insert_certificate_data(excel_path, error_data, f"Error al procesar: {error_msg}", filename)
-        except Exception as excel_error:
-            logger.error(f"Error insertando error en Excel: {excel_error}")
-        
-        return False, error_msg
+            excel_manager.insert_certificate_data(excel_path, result.certificate_info, result.transcription, filename)
+            logger.debug("✅ Éxito: %s", filename)
+            return True
+        except Exception as e:
+            result = ExtractionResult.failed(e)
 
-def process_multipage_pdf(pdf_path: str, extractor: DocumentExtractorReport, 
-                         excel_manager: ExcelReportManager) -> Tuple[int, int]:
+    logger.error(f"❌ Error procesando {filename}: {result.error}")
+    try:
+        excel_manager.insert_certificate_data(
+            excel_path, {'certificate_name': '', 'message_error': result.error},
+            result.transcription, filename
+        )
+    except Exception as excel_error:
+        logger.error(f"Error insertando error en Excel: {excel_error}")
+    return False
+
+def _log_report_summary(excel_path: Path, successful: int, failed: int) -> None:
+    """Una línea por reporte en lugar de una por archivo exitoso (que va a debug)"""
+    logger.info("📊 %s: %d exitosos / %d con error", Path(excel_path).name, successful, failed)
+
+def process_batch(file_paths: list, excel_manager: ExcelReportManager, extractor: DocumentExtractorReport,
+                  excel_path: Path) -> Tuple[int, int]:
     """
-    🆕 NUEVA FUNCIÓN PRINCIPAL: Maneja PDFs con múltiples páginas
-    
-    Args:
-        pdf_path: Ruta del PDF multipágina
-        extractor: Instancia del extractor
-        excel_manager: Gestor de Excel
-        
+    Procesa varios archivos con un solo lote de la Batch API (ver
+    DocumentExtractorReport.extract_batch) e inserta sus filas en el Excel.
+
     Returns:
         Tuple[int, int]: (archivos_procesados_exitosamente, archivos_con_error)
     """
-    logger.info("="*60)
-    logger.info(f"🔄 PROCESANDO PDF MULTIPÁGINA: {os.path.basename(pdf_path)}")
-    logger.info("="*60)
-    
-    # Obtener información del archivo
+    results = extractor.extract_batch(file_paths)
+    successful = sum(
+        _insert_result(excel_manager, excel_path, file_path, results[file_path])
+        for file_path in file_paths
+    )
+    _log_report_summary(excel_path, successful, len(file_paths) - successful)
+    return successful, len(file_paths) - successful
+
+# Event loop único para process_tasks: los clientes asíncronos guardan
+# conexiones ligadas al loop en que se abrieron, así que se reutiliza el mismo
+_EVENT_LOOP = None
+
+def _run_async(coroutine):
+    """Ejecuta una corrutina en el event loop del módulo, creándolo la primera vez"""
+    global _EVENT_LOOP
+    if _EVENT_LOOP is None:
+        _EVENT_LOOP = asyncio.new_event_loop()
+    return _EVENT_LOOP.run_until_complete(coroutine)
+
+def process_tasks(tasks: list, excel_manager: ExcelReportManager, extractor: DocumentExtractorReport,
+                  max_concurrency: int = MAX_CONCURRENT_REQUESTS) -> Tuple[int, int]:
+    """
+    Procesa a la vez una lista de tareas (ruta_archivo, excel_path), que
+    pueden ser de carpetas y reportes distintos, con extract_content_async y
+    un máximo de max_concurrency solicitudes en curso. Cada fila se inserta
+    en el Excel de su tarea.
+
+    La escritura va en paralelo con la extracción: las filas se insertan en
+    orden a medida que terminan sus archivos, y cada Excel se guarda en cuanto
+    se escribe su última fila, mientras el resto de archivos sigue en curso.
+
+    Returns:
+        Tuple[int, int]: (archivos_procesados_exitosamente, archivos_con_error)
+    """
+    # Índice de la última tarea de cada Excel
+    last_task = {excel_path: index for index, (_, excel_path) in enumerate(tasks)}
+
+    async def _process_all():
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def _extract(file_path):
+            async with semaphore:
+                logger.info("📄 Procesando archivo: %s", os.path.basename(file_path))
+                try:
+                    return ExtractionResult(*await extractor.extract_content_async(file_path))
+                except Exception as e:
+                    return ExtractionResult.failed(e)
+
+        futures = [asyncio.ensure_future(_extract(file_path)) for file_path, _ in tasks]
+
+        # El Excel se escribe en el hilo del event loop, una fila por archivo
+        # en orden, así no hace falta bloquear los libros
+        successful = 0
+        # (exitosos, con error) de cada Excel, para su resumen
+        report_counts = {}
+        for index, ((file_path, excel_path), future) in enumerate(zip(tasks, futures)):
+            inserted = _insert_result(excel_manager, excel_path, file_path, await future)
+            successful += inserted
+            report_successful, report_failed = report_counts.get(excel_path, (0, 0))
+            report_counts[excel_path] = (report_successful + inserted, report_failed + (not inserted))
+            if last_task[excel_path] == index:
+                _log_report_summary(excel_path, *report_counts.pop(excel_path))
+                # Ya no llegan más filas a este libro: se guarda en un hilo
+                # para no detener las solicitudes en curso
+                try:
+                    await asyncio.to_thread(excel_manager.save, excel_path)
+                except Exception as e:
+                    logger.error(f"Error guardando Excel {excel_path}: {str(e)}")
+        return successful
+
+    successful = _run_async(_process_all())
+    return successful, len(tasks) - successful
+
+def split_multipage_pdf(pdf_path: str, extractor: DocumentExtractorReport,
+                        excel_manager: ExcelReportManager) -> Optional[Tuple[list, Path]]:
+    """
+    Separa un PDF multipágina en sus páginas y crea el Excel de sus
+    certificados en la carpeta <nombre>_paginas_separadas. Las páginas se
+    devuelven como PdfPage, para procesarlas en memoria; solo con
+    SAVE_SPLIT_PAGES se escriben además como archivos en esa carpeta.
+
+    Returns:
+        Tuple[list, Path]: (páginas, excel_path), o None si no se pudo separar
+    """
     pdf_path_obj = Path(pdf_path)
     base_name = pdf_path_obj.stem
-    parent_dir = pdf_path_obj.parent
-    
-    # Crear directorio para las páginas separadas
-    split_directory = parent_dir / f"{base_name}_paginas_separadas"
+    split_directory = pdf_path_obj.parent / f"{base_name}_paginas_separadas"
     
-    # Separar el PDF en páginas individuales
-    success, created_files = extractor.pdf_splitter.split_pdf_pages(pdf_path, str(split_directory))
+    if SAVE_SPLIT_PAGES:
+        success, created_files = extractor.pdf_splitter.split_pdf_pages(pdf_path, str(split_directory))
+    else:
+        page_count = extractor.pdf_splitter.get_pdf_page_count(pdf_path)
+        os.makedirs(split_directory, exist_ok=True)
+        success = page_count > 0
+        created_files = [
+            PdfPage(pdf_path, page_num, str(split_directory / f"{base_name}_pagina_{page_num + 1:02d}.pdf"))
+            for page_num in range(page_count)
+        ]
+        logger.info("📄 PDF '%s' con %d páginas: se procesan en memoria", base_name, page_count)
     
     if not success or not created_files:
         logger.error(f"❌ No se pudieron separar las páginas del PDF: {pdf_path}")
-        return 0, 1
+        return None
     
-    # Crear archivo Excel para este PDF multipágina
     excel_path = excel_manager.create_excel_template(str(split_directory), f"reporte_{base_name}")
-    
-    logger.info(f"📊 Creado archivo Excel: {excel_path}")
-    
-    # Procesar cada página separada
-    successful_extractions = 0
-    failed_extractions = 0
-    
-    for page_file in created_files:
-        success, error_msg = process_single_file(
-            page_file, excel_manager, extractor, excel_path, base_name
-        )
-        
-        if success:
-            successful_extractions += 1
-        else:
-            failed_extractions += 1
-    
-    # Mostrar resumen del PDF multipágina
-    logger.info("="*60)
-    logger.info(f"📋 RESUMEN PDF MULTIPÁGINA '{base_name}':")
-    logger.info(f"   📄 Páginas separadas: {len(created_files)}")
-    logger.info(f"   ✅ Procesadas exitosamente: {successful_extractions}")
-    logger.info(f"   ❌ Con errores: {failed_extractions}")
-    logger.info(f"   📊 Excel generado: {excel_path.name}")
-    logger.info(f"   📂 Archivos en: {split_directory}")
-    logger.info("="*60)
-    
-    return successful_extractions, failed_extractions
+    logger.info("📊 Creado archivo Excel: %s", excel_path)
+    return created_files, excel_path
+
+def _walk_certificates(root: str):
+    """
+    Recorre recursivamente una carpeta usando os.scandir. A diferencia de
+    os.walk, conserva los DirEntry de los archivos: su nombre, su ruta y su
+    tipo ya vienen en la entrada del directorio, sin un stat adicional.
+
+    Yields:
+        tuple: (ruta_carpeta, lista de DirEntry de los archivos de la carpeta)
+    """
+    files = []
+    subdirectories = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                files.append(entry)
+            elif entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+
+    yield root, files
+
+    for subdirectory in subdirectories:
+        yield from _walk_certificates(subdirectory)
 
 def process_certificates_directory():
     """🆕 FUNCIÓN PRINCIPAL MEJORADA: Procesa todos los certificados incluyendo manejo de PDFs multipágina"""
     
-    logger.info("=" * 80)
+    logger.info(_BANNER)
     logger.info(f"🚀 INICIANDO PROCESAMIENTO CON MODELO: {DEFAULT_MODEL.upper()}")
-    logger.info("=" * 80)
+    logger.info(_BANNER)
     logger.info("📋 CARACTERÍSTICAS IMPLEMENTADAS:")
     logger.info("   ✅ Primera fila: Fecha de procesamiento destacada")
     logger.info("   ✅ Primera columna: Nombre del archivo para trazabilidad")
@@ -874,11 +1848,10 @@ def process_certificates_directory():
     logger.info("   🆕 NUEVA: Separación automática de PDFs multipágina")
     logger.info("   🆕 NUEVA: Procesamiento individual de cada página/certificado")
     logger.info("   🆕 NUEVA: Reportes independientes para PDFs multipágina")
-    logger.info("=" * 80)
+    logger.info(_BANNER)
     
     # Configuración
     extractor = DocumentExtractorReport()
-    excel_manager = ExcelReportManager()
     
     # Directorios
     directorio_actual = os.path.dirname(os.path.abspath(__file__))
@@ -888,61 +1861,78 @@ def process_certificates_directory():
         logger.error(f"El directorio {carpeta_certificates} no existe")
         return
     
-    # Extensiones prohibidas
-    extensiones_prohibidas = {ext.value for ext in ArchivoProhibido}
-    
     # Contadores para estadísticas GLOBALES
     total_processed = 0
     successful_extractions = 0
     failed_extractions = 0
     multipage_pdfs_processed = 0
     
-    # Procesar cada carpeta
-    for raiz, dirs, archivos in os.walk(carpeta_certificates):
-        nombre_carpeta = os.path.basename(raiz)
+    # Los libros se guardan al terminar todas las tareas; el with los guarda
+    # también si el procesamiento se interrumpe
+    with ExcelReportManager() as excel_manager:
+        # Lista plana de tareas (ruta_archivo, excel_path) de todas las
+        # carpetas, incluidas las páginas de los PDFs multipágina: se procesan
+        # juntas, así una carpeta grande o un PDF largo no frenan a las demás
+        tasks = []
+        # Archivos que se envían en un lote por reporte (USE_BATCH_API)
+        batch_files = {}
         
-        # Filtrar archivos permitidos
-        archivos_permitidos = [
-            archivo for archivo in archivos 
-            if os.path.splitext(archivo)[1].lower() not in extensiones_prohibidas
-        ]
-        
-        if not archivos_permitidos:
-            continue
+        for raiz, archivos in _walk_certificates(carpeta_certificates):
+            nombre_carpeta = os.path.basename(raiz)
             
-        logger.info(f"📁 Procesando carpeta: {nombre_carpeta} ({len(archivos_permitidos)} archivos)")
-        
-        # Crear archivo Excel para archivos de página única en esta carpeta
-        excel_path = excel_manager.create_excel_template(raiz, f"reporte_{nombre_carpeta}")
-        
-        # Procesar cada archivo
-        for archivo in archivos_permitidos:
-            path_file = os.path.join(raiz, archivo)
-            total_processed += 1
-            
-            # 🆕 NUEVA LÓGICA: Verificar si es PDF multipágina
-            if extractor.should_split_pdf(path_file):
-                logger.info(f"🔄 PDF multipágina detectado: {archivo}")
-                multipage_pdfs_processed += 1
-                
-                # Procesar PDF multipágina por separado
-                mp_success, mp_failed = process_multipage_pdf(path_file, extractor, excel_manager)
-                successful_extractions += mp_success
-                failed_extractions += mp_failed
-                
-            else:
-                # Procesar archivo normalmente (PDF de 1 página u otros formatos)
-                success, error_msg = process_single_file(
-                    path_file, excel_manager, extractor, excel_path, nombre_carpeta
-                )
+            # Filtrar archivos permitidos (la extensión es lo que sigue al último punto)
+            archivos_permitidos = [
+                archivo for archivo in archivos 
+                if archivo.name[archivo.name.rfind('.'):].lower() not in _EXTENSIONES_PROHIBIDAS
+            ]
+            
+            if not archivos_permitidos:
+                continue
+            
+            logger.info("📁 Preparando carpeta: %s (%d archivos)", nombre_carpeta, len(archivos_permitidos))
+            
+            # Crear archivo Excel para archivos de página única en esta carpeta
+            excel_path = excel_manager.create_excel_template(raiz, f"reporte_{nombre_carpeta}")
+            
+            for archivo in archivos_permitidos:
+                path_file = archivo.path
+                total_processed += 1
                 
-                if success:
-                    successful_extractions += 1
+                # 🆕 NUEVA LÓGICA: Verificar si es PDF multipágina
+                if extractor.should_split_pdf(path_file):
+                    logger.info("🔄 PDF multipágina detectado: %s", archivo.name)
+                    multipage_pdfs_processed += 1
+                    
+                    # Sus páginas se procesan como tareas de su propio Excel
+                    split = split_multipage_pdf(path_file, extractor, excel_manager)
+                    if split is None:
+                        failed_extractions += 1
+                        continue
+                    created_files, pages_excel_path = split
+                    tasks.extend((page_file, pages_excel_path) for page_file in created_files)
+                    
+                elif USE_BATCH_API:
+                    batch_files.setdefault(excel_path, []).append(path_file)
+                    
                 else:
-                    failed_extractions += 1
+                    tasks.append((path_file, excel_path))
+        
+        if tasks:
+            logger.info(f"🚀 Procesando {len(tasks)} archivos de todas las carpetas")
+            tasks_success, tasks_failed = process_tasks(tasks, excel_manager, extractor)
+            successful_extractions += tasks_success
+            failed_extractions += tasks_failed
+        
+        for excel_path, file_paths in batch_files.items():
+            batch_success, batch_failed = process_batch(file_paths, excel_manager, extractor, excel_path)
+            successful_extractions += batch_success
+            failed_extractions += batch_failed
+        
+        # PDFs que se contaron pero no llegaron a OCR (p. ej. respuestas en caché)
+        extractor.pdf_splitter.close_documents()
     
     # Mostrar estadísticas finales MEJORADAS
-    logger.info("=" * 80)
+    logger.info(_BANNER)
     logger.info("📊 RESUMEN FINAL DE PROCESAMIENTO:")
     logger.info(f"🤖 Modelo utilizado: {DEFAULT_MODEL.upper()}")
     logger.info(f"📝 Total de archivos procesados: {total_processed}")
@@ -953,7 +1943,7 @@ def process_certificates_directory():
         logger.info(f"📈 Tasa de éxito: {(successful_extractions/total_processed*100):.1f}%")
     else:
         logger.info("📈 Tasa de éxito: N/A")
-    logger.info("=" * 80)
+    logger.info(_BANNER)
     
     if multipage_pdfs_processed > 0:
         logger.info("🎯 NOTA: Los PDFs multipágina fueron separados automáticamente")
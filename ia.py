@@ -1,15 +1,97 @@
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
 import google.generativeai as genai
+from google.api_core import retry as api_retry
 from openai import OpenAI, RateLimitError, APIConnectionError, Timeout, OpenAIError
 from typing import Optional
-import json, os
-from PIL import Image
+import json, os, hashlib, io, logging, re, threading, time
+from concurrent.futures import Future
+from functools import lru_cache
+from PIL import Image, ImageOps
 import anthropic
 import base64
 
+from utils import CacheResultados, calcular_hash_archivo, reducir_pdf
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Respuestas ya obtenidas, indexadas por clase de inferencia, prompt y
+# contenido: el mismo texto o PDF no vuelve a la API en una nueva ejecución.
+# Para forzar nuevas inferencias basta con borrar el directorio
+_DIRECTORIO_CACHE_INFERENCIAS = os.getenv(
+    'INFERENCE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.inference_cache')
+)
+_CACHE_INFERENCIAS = None
+
+# Segundos que se espera a OpenAI, desde que empieza su solicitud, antes de
+# lanzar en paralelo la solicitud a Claude (solicitud cubierta). Con 0 ambas
+# salen a la vez; con un valor negativo Claude solo se consulta después de
+# OpenAI, como respaldo
+HEDGE_DELAY_SECONDS = float(os.getenv('HEDGE_DELAY_SECONDS', '8'))
+# Segundos entre consultas del estado de un lote de la Batch API de OpenAI
+BATCH_POLL_INTERVAL = float(os.getenv('BATCH_POLL_INTERVAL', '30'))
+
+# Reintentos ante límites de solicitudes (429), errores de conexión y 5xx. Los
+# SDK de OpenAI y Anthropic esperan con backoff exponencial y respetan el
+# encabezado Retry-After; a Gemini se le pasa un Retry equivalente
+MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '5'))
+_GEMINI_RETRY = api_retry.Retry(initial=1.0, maximum=32.0, multiplier=2.0, timeout=300.0)
+
+class _RateLimiter:
+    """
+    Limita las solicitudes por minuto a un proveedor, espaciándolas de forma
+    uniforme entre los hilos que lo usan. Sin límite si max_rpm es 0.
+
+    El límite es por proceso: con el pool de app.py, cada proceso tiene el suyo.
+    """
+    def __init__(self, max_rpm: float):
+        self.interval = 60.0 / max_rpm if max_rpm > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Bloquea hasta el siguiente turno libre"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# Un limitador por proveedor, configurado con OPENAI_MAX_RPM, ANTHROPIC_MAX_RPM y GEMINI_MAX_RPM
+_OPENAI_LIMITER = _RateLimiter(float(os.getenv('OPENAI_MAX_RPM', '0')))
+_ANTHROPIC_LIMITER = _RateLimiter(float(os.getenv('ANTHROPIC_MAX_RPM', '0')))
+_GEMINI_LIMITER = _RateLimiter(float(os.getenv('GEMINI_MAX_RPM', '0')))
+
+def _cache_inferencias() -> CacheResultados:
+    """Caché de inferencias, creada la primera vez que se usa"""
+    global _CACHE_INFERENCIAS
+    if _CACHE_INFERENCIAS is None:
+        _CACHE_INFERENCIAS = CacheResultados(_DIRECTORIO_CACHE_INFERENCIAS)
+    return _CACHE_INFERENCIAS
+
+# Un solo cliente por proveedor en todo el proceso: cada instancia de las
+# clases de inferencia comparte el mismo pool de conexiones HTTP, así que las
+# conexiones TLS ya abiertas se reutilizan entre instancias
+@lru_cache(maxsize=1)
+def _openai_client() -> OpenAI:
+    return OpenAI(api_key=os.getenv('API_OPENAI'), max_retries=MAX_RETRIES)
+
+@lru_cache(maxsize=1)
+def _anthropic_client() -> anthropic.Anthropic:
+    return anthropic.Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'), max_retries=MAX_RETRIES)
+
+@lru_cache(maxsize=1)
+def _gemini_model(model_name: str = 'gemini-1.5-flash'):
+    """genai.configure modifica estado global: se llama una sola vez"""
+    genai.configure(api_key=os.getenv('GEMINI_API'))
+    return genai.GenerativeModel(model_name)
+
 class InferenceError(Exception):
     """Clase personalizada para errores de inferencia"""
     pass
@@ -18,13 +100,42 @@ class ResponseParsingError(Exception):
     """Clase personalizada para errores de parsing de respuesta"""
     pass
 
+class _Cancelled(Exception):
+    """La otra solicitud cubierta ya trajo la fecha de emisión"""
+    pass
+
+# Se reutiliza en cada parse_response; raw_decode admite una posición inicial
+_JSON_DECODER = json.JSONDecoder()
+
+def _first_json_object(text: str):
+    """
+    Devuelve el primer objeto JSON válido del texto, probando desde cada '{'
+    (el modelo a veces escribe texto con llaves antes del JSON), o None si no hay.
+    """
+    start_idx = text.find('{')
+    while start_idx != -1:
+        try:
+            return _JSON_DECODER.raw_decode(text, start_idx)[0]
+        except json.JSONDecodeError:
+            start_idx = text.find('{', start_idx + 1)
+    return None
+
+# Las fechas de la respuesta se aceptan si empiezan con AAAA-MM-DD; textos
+# como "N/A" o "desconocida" cuentan como fecha no encontrada
+_ISO_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+def _iso_date_or_none(value):
+    """La fecha tal cual si tiene formato ISO, o None"""
+    return value if isinstance(value, str) and _ISO_DATE.match(value) else None
+
 class BaseInference(ABC):
     """
     Clase base abstracta que define la estructura común para las clases de inferencia.
     Contiene la lógica compartida para el procesamiento de respuestas y el prompt base.
     """
-    def __init__(self):
-        self.prompt = """Tu tarea es extraer información específica de certificados escaneados, siendo especialmente flexible con variaciones en el texto debido a OCR.
+    # El prompt es un atributo de clase: es idéntico byte a byte en todas las
+    # solicitudes, así los proveedores pueden reutilizarlo de su caché de prefijos
+    prompt = """Tu tarea es extraer información específica de certificados escaneados, siendo especialmente flexible con variaciones en el texto debido a OCR.
 
         INSTRUCCIONES DE EXTRACCIÓN:
 
@@ -102,19 +213,13 @@ class BaseInference(ABC):
             ResponseParsingError: Si hay problemas al procesar el JSON
         """
         try:
-            # Encontramos los índices del JSON en la respuesta
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}')
+            # Decodificamos el primer objeto JSON de la respuesta
+            data = _first_json_object(response_text)
             
-            if start_idx == -1 or end_idx == -1:
+            if data is None:
+                logger.error("Texto recibido: %s", response_text)
                 raise ResponseParsingError("No se encontró una estructura JSON válida en la respuesta")
             
-            # Extraemos la cadena JSON
-            json_str = response_text[start_idx:end_idx + 1]
-            
-            # Parseamos el JSON
-            data = json.loads(json_str)
-            
             # Validamos la estructura
             if not isinstance(data, dict):
                 raise ResponseParsingError("La respuesta no es un objeto JSON válido")
@@ -126,18 +231,46 @@ class BaseInference(ABC):
             return {
                 'name': data.get('name'),
                 'identification': data.get('identification'),
-                'issue_date': data.get('issue_date'),
-                'expiration_date': data.get('expiration_date'),
+                'issue_date': _iso_date_or_none(data.get('issue_date')),
+                'expiration_date': _iso_date_or_none(data.get('expiration_date')),
                 'message_error': None
             }
         
-        except json.JSONDecodeError as e:
-            print(f"Texto recibido: {response_text}")
-            print(f"Intento de JSON: {json_str if 'json_str' in locals() else 'No se pudo extraer JSON'}")
-            raise ResponseParsingError(f"Error al decodificar JSON: {str(e)}")
         except Exception as e:
             raise ResponseParsingError(f"Error inesperado al procesar la respuesta: {str(e)}")
 
+    def cache_key(self, content) -> str:
+        """
+        Clave de la caché de inferencias: el SHA-256 de la clase, el prompt y
+        el contenido. Un cambio en el prompt invalida las respuestas anteriores
+        sin llevar una versión a mano.
+        """
+        key = hashlib.sha256()
+        for part in (type(self).__name__, self.prompt):
+            key.update(part.encode('utf-8'))
+            key.update(b'\0')
+        key.update(content if isinstance(content, bytes) else str(content).encode('utf-8'))
+        return key.hexdigest()
+
+    def cached_inference(self, content, infer):
+        """
+        Devuelve la respuesta guardada para el contenido o, si no la hay,
+        llama a infer() y guarda su resultado. Solo se guardan las respuestas
+        válidas (diccionarios).
+
+        Args:
+            content: Texto o bytes enviados al modelo
+            infer: Función sin argumentos que hace la solicitud a la API
+        """
+        key = self.cache_key(content)
+        cache = _cache_inferencias()
+        result = cache.get(key)
+        if result is None:
+            result = infer()
+            if isinstance(result, dict):
+                cache.set(key, result)
+        return result
+
     @abstractmethod
     def get_inference(self, content):
         """
@@ -162,64 +295,272 @@ class OpenAIInference(BaseInference):
     """Clase para manejar la inferencia usando OpenAI"""
     def __init__(self):
         super().__init__()
-        self.api_key = os.getenv('API_OPENAI')
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = _openai_client()
         self.claude_fallback = AntropicInferenceForPDF()
 
     def get_inference(self, content_certificate, path_pdf=None):
+        # Con path_pdf la respuesta puede venir de Claude, que lee el PDF y no
+        # el OCR: la clave incluye el hash del archivo, porque escaneos en
+        # blanco distintos dan el mismo texto
+        content = content_certificate
+        if path_pdf is not None:
+            content = f"{content_certificate}\0{calcular_hash_archivo(str(path_pdf))}"
+        return self.cached_inference(
+            content, lambda: self._get_inference(content_certificate, path_pdf))
+
+    def _get_inference(self, content_certificate, path_pdf=None):
+        """
+        Consulta a OpenAI y, si no encuentra la fecha de emisión, a Claude con
+        el PDF. Con PDF, si OpenAI tarda más de HEDGE_DELAY_SECONDS, Claude se
+        consulta en paralelo (ver _hedged_inference).
+        """
+        if path_pdf is not None and HEDGE_DELAY_SECONDS >= 0:
+            return self._hedged_inference(content_certificate, path_pdf)
+
+        certificate_info = self._openai_inference(content_certificate)
+        if certificate_info['issue_date'] is None:
+            logger.debug("Sin fecha de emisión en OpenAI: se procesa con Claude")
+            certificate_info = self.claude_fallback.get_inference(path_pdf)
+        else:
+            logger.debug("Procesado con OpenAI")
+        return certificate_info
+
+    def _hedged_inference(self, content_certificate, path_pdf):
+        """
+        Solicitud cubierta: OpenAI corre en este hilo y Claude en un
+        temporizador propio de esta llamada, que arranca junto con la
+        solicitud a OpenAI (la espera de otros hilos no cuenta como demora).
+        La primera respuesta con fecha de emisión cancela a la otra, que deja
+        de leer su stream y así el modelo no sigue generando tokens.
+        """
+        cancel_openai = threading.Event()
+        cancel_claude = threading.Event()
+        claude_future = Future()
+
+        def claude_inference():
+            if not claude_future.set_running_or_notify_cancel():
+                return
+            logger.info("OpenAI tarda: se consulta también a Claude")
+            try:
+                result = self.claude_fallback.get_inference(path_pdf, cancel_claude)
+            except BaseException as e:
+                claude_future.set_exception(e)
+                return
+            if result.get('issue_date') is not None:
+                cancel_openai.set()
+            claude_future.set_result(result)
+
+        timer = threading.Timer(HEDGE_DELAY_SECONDS, claude_inference)
+        timer.daemon = True
+        timer.start()
         try:
-            completion = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                store=True,
-                messages=[
-                    {"role": "system", "content": self.prompt},
-                    {"role": "user", "content": content_certificate}
-                ],
-                temperature=0.3
-            )
-            response_text = completion.choices[0].message.content
+            certificate_info = self._openai_inference(content_certificate, cancel_openai)
+        except _Cancelled:
+            # Claude respondió primero con la fecha de emisión
+            return claude_future.result()
+        except Exception:
+            timer.cancel()
+            if claude_future.cancel():
+                # Claude no llegó a consultarse: el error se propaga como siempre
+                raise
+            return claude_future.result()
+
+        timer.cancel()
+        if certificate_info['issue_date'] is not None:
+            if not claude_future.cancel():
+                cancel_claude.set()
+            logger.debug("Procesado con OpenAI")
+            return certificate_info
+        if claude_future.cancel():
+            logger.debug("Sin fecha de emisión en OpenAI: se procesa con Claude")
+            return self.claude_fallback.get_inference(path_pdf)
+        # Claude ya estaba en curso: vale su respuesta, como sin cobertura
+        return claude_future.result()
+
+    def _completion_params(self, content_certificate) -> dict:
+        """Parámetros de la solicitud, comunes a la interactiva y a la Batch API"""
+        return {
+            "model": "gpt-3.5-turbo",
+            "store": True,
+            "messages": [
+                {"role": "system", "content": self.prompt},
+                {"role": "user", "content": content_certificate}
+            ],
+            "temperature": 0.3
+        }
+
+    def _openai_inference(self, content_certificate, cancel: Optional[threading.Event] = None) -> dict:
+        """
+        Una solicitud a OpenAI, sin respaldo. La respuesta se lee en streaming
+        para poder abandonarla (_Cancelled) en cuanto se active cancel.
+        """
+        try:
+            _OPENAI_LIMITER.wait()
+            parts = []
+            with self.client.chat.completions.create(
+                    **self._completion_params(content_certificate), stream=True) as stream:
+                for chunk in stream:
+                    if cancel is not None and cancel.is_set():
+                        raise _Cancelled()
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+            response_text = "".join(parts)
 
             if not response_text:
                 raise Exception("La API no devolvió ninguna respuesta")
                 
             certificate_info = self.parse_response(response_text)
-            print('EVALUANDOOOOOOOOOOOOOO',certificate_info)
-            if certificate_info['issue_date'] is None:
-                print('Procesado con IAAAAAAAAA CLAUDE')
-                certificate_info = self.claude_fallback.get_inference(path_pdf)
-            else:
-                print('Procesadooooooooooooooo con OpenAI')
+            logger.debug("Respuesta de OpenAI: %s", certificate_info)
 
             # print(f"Información extraída: {certificate_info}")
             return certificate_info
         
+        except _Cancelled:
+            logger.debug("Solicitud a OpenAI cancelada: Claude respondió primero")
+            raise
         except RateLimitError as e:
-            print(f"Límite de solicitudes alcanzado: {str(e)}")
+            logger.error("Límite de solicitudes alcanzado: %s", e)
             # Tal vez podrías pausar la ejecución aquí y esperar un rato antes de reintentar
             raise
         except APIConnectionError as e:
-            print(f"Problema de conexión con la API: {str(e)}")
+            logger.error("Problema de conexión con la API: %s", e)
             raise
         except Timeout as e:
-            print(f"Se alcanzó el tiempo de espera al conectar con la API: {str(e)}")
+            logger.error("Se alcanzó el tiempo de espera al conectar con la API: %s", e)
             raise
         except OpenAIError as e:
-            print(f"Error general en la API de OpenAI: {str(e)}")
+            logger.error("Error general en la API de OpenAI: %s", e)
             raise
         except Exception as e:
-            print(f"Error inesperado: {str(e)}")
+            logger.error("Error inesperado: %s", e)
             raise
 
+    def get_batch_inference(self, contents: dict) -> dict:
+        """
+        Obtiene la información de varios certificados con un solo lote de la
+        Batch API de OpenAI (mitad de costo y sin consumir la cuota de las
+        solicitudes interactivas). Espera, consultando cada BATCH_POLL_INTERVAL
+        segundos, hasta que el lote termine. Para reprocesos masivos; el uso
+        interactivo sigue siendo get_inference.
+
+        Los certificados ya en la caché de inferencias no se envían. A
+        diferencia de get_inference, no se consulta a Claude cuando falta la
+        fecha de emisión (el lote no tiene los PDF), y esas respuestas no se
+        guardan en la caché.
+
+        Args:
+            contents: Diccionario {custom_id: texto del certificado}
+
+        Returns:
+            dict: {custom_id: info_certificado}, o la excepción InferenceError
+            de las solicitudes que fallaron
+        """
+        cache = _cache_inferencias()
+        results = {}
+        pending = {}
+        for custom_id, content in contents.items():
+            cached = cache.get(self.cache_key(content))
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                pending[custom_id] = content
+        if not pending:
+            return results
+
+        try:
+            # Una línea JSONL por certificado, con los mismos parámetros que get_inference
+            lines = [
+                json.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._completion_params(content)
+                }, ensure_ascii=False)
+                for custom_id, content in pending.items()
+            ]
+            batch_file = self.client.files.create(
+                file=("certificados.jsonl", "\n".join(lines).encode("utf-8")),
+                purpose="batch"
+            )
+            batch = self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            logger.info("Lote %s enviado con %d certificados", batch.id, len(lines))
+
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                time.sleep(BATCH_POLL_INTERVAL)
+                batch = self.client.batches.retrieve(batch.id)
+
+            if batch.status != "completed":
+                raise InferenceError(f"El lote {batch.id} terminó con estado: {batch.status}")
+
+            output = self.client.files.content(batch.output_file_id).text if batch.output_file_id else ""
+        except InferenceError:
+            raise
+        except OpenAIError as e:
+            logger.error("Error en la Batch API de OpenAI: %s", e)
+            raise InferenceError(f"Error en la Batch API de OpenAI: {str(e)}")
+
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            custom_id = item["custom_id"]
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                results[custom_id] = InferenceError(f"Error en OpenAI: {item.get('error') or response.get('body')}")
+                continue
+            try:
+                response_text = response["body"]["choices"][0]["message"]["content"]
+                if not response_text:
+                    raise InferenceError("La API no devolvió ninguna respuesta")
+                certificate_info = self.parse_response(response_text)
+            except Exception as e:
+                results[custom_id] = InferenceError(f"Error inesperado: {str(e)}")
+                continue
+            results[custom_id] = certificate_info
+            if certificate_info['issue_date'] is not None:
+                cache.set(self.cache_key(pending[custom_id]), certificate_info)
+
+        # Las solicitudes que no aparecen en la salida fallaron dentro del lote
+        for custom_id in pending:
+            results.setdefault(custom_id, InferenceError("La solicitud no se completó en el lote"))
+
+        return results
+
+# Lado mayor de las imágenes que se envían a Gemini: el modelo reduce igual
+# las más grandes, así que subirlas completas solo agrega bytes y latencia
+GEMINI_MAX_IMAGE_SIDE = 1568
+
+def _image_part(image_data: bytes) -> dict:
+    """
+    Parte de imagen para generate_content a partir de los bytes del archivo.
+    Las imágenes que no superan GEMINI_MAX_IMAGE_SIDE se envían tal cual, sin
+    decodificarlas (Image.open solo lee el encabezado); las demás se orientan
+    según su EXIF, se reducen y se envían como JPEG.
+    """
+    with Image.open(io.BytesIO(image_data)) as image:
+        if max(image.size) <= GEMINI_MAX_IMAGE_SIDE:
+            return {"mime_type": Image.MIME.get(image.format, "image/jpeg"), "data": image_data}
+        # En JPEG, draft decodifica directamente a una escala menor
+        image.draft("RGB", (GEMINI_MAX_IMAGE_SIDE, GEMINI_MAX_IMAGE_SIDE))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((GEMINI_MAX_IMAGE_SIDE, GEMINI_MAX_IMAGE_SIDE), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.convert("RGB").save(buffer, format="JPEG", quality=90)
+    return {"mime_type": "image/jpeg", "data": buffer.getvalue()}
+
 class GeminiInferenceForImages(BaseInference):
     def __init__(self):
         super().__init__()
-        self.api_key = os.getenv('GEMINI_API')
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = _gemini_model()
         
     def get_inference(self, image_path):
         """
-        Analiza una imagen usando la API de Gemini.
+        Analiza una imagen usando la API de Gemini. Una imagen ya analizada
+        (mismo contenido) se toma de la caché de inferencias.
 
         Args:
             image_path (str): La ruta a la imagen que se va a analizar.
@@ -229,8 +570,20 @@ class GeminiInferenceForImages(BaseInference):
             str: La respuesta del modelo.
         """
         try:
-            image = Image.open(image_path)
-            response = self.model.generate_content([self.prompt, image])
+            with open(image_path, 'rb') as f:
+                image_data = f.read()
+        except FileNotFoundError:
+            return "Error: La imagen no se encontró en la ruta especificada."
+        return self.cached_inference(image_data, lambda: self._get_inference(image_data))
+
+    def _get_inference(self, image_data: bytes):
+        try:
+            # Se usan los bytes ya leídos para la clave de la caché: el archivo
+            # no se vuelve a abrir
+            image = _image_part(image_data)
+            _GEMINI_LIMITER.wait()
+            response = self.model.generate_content(
+                [self.prompt, image], request_options={"retry": _GEMINI_RETRY})
             response.resolve()
 
             if response.text:
@@ -239,34 +592,72 @@ class GeminiInferenceForImages(BaseInference):
             else:
                 return "No se generó respuesta de texto."
 
-        except FileNotFoundError:
-            return "Error: La imagen no se encontró en la ruta especificada."
         except Exception as e:
             return f"Ocurrió un error: {e}"
 
 class AntropicInferenceForPDF(BaseInference):
+    # Múltiplo de 3: cada bloque se codifica sin relleno y las partes se concatenan tal cual
+    PDF_READ_CHUNK = 3 * 64 * 1024
+
     def __init__(self):
         super().__init__()
-        self.api_key = os.getenv('ANTHROPIC_API_KEY')
-        self.client = anthropic.Anthropic(api_key=self.api_key)
+        self.client = _anthropic_client()
         self.model = "claude-3-5-sonnet-20241022"
         # claude-3-5-sonnet-20240620
         # "claude-3-5-sonnet-20241022"
 
     def read_pdf(self, path_pdf):
+        """
+        Codifica el PDF en base64 por bloques de PDF_READ_CHUNK bytes: en
+        memoria solo queda la codificación, no también el archivo completo.
+        """
         try:
+            encoded = bytearray()
             with open(path_pdf, "rb") as f:
-                pdf_data = base64.b64encode(f.read()).decode("utf-8")
-            return pdf_data
+                while chunk := f.read(self.PDF_READ_CHUNK):
+                    encoded += base64.b64encode(chunk)
+            return encoded.decode("ascii")
         except FileNotFoundError:
             raise InferenceError("El archivo PDF no se encontró en la ruta especificada")
     
-    def get_inference(self, path_pdf):
+    def get_inference(self, path_pdf, cancel: Optional[threading.Event] = None):
+        if path_pdf is None:
+            # OpenAIInference llega aquí sin PDF cuando solo recibió texto
+            raise InferenceError("No hay PDF para consultar a Claude")
+        # La clave de la caché es el hash del PDF original: el archivo solo se
+        # reduce y se codifica si hay que enviarlo a la API
+        try:
+            file_hash = calcular_hash_archivo(str(path_pdf))
+        except FileNotFoundError:
+            raise InferenceError("El archivo PDF no se encontró en la ruta especificada")
+        return self.cached_inference(
+            file_hash, lambda: self._get_inference(self._pdf_for_upload(path_pdf), cancel))
+
+    def _pdf_for_upload(self, path_pdf) -> str:
+        """El PDF reducido (ver reducir_pdf) en base64, o el original si no se redujo"""
+        reduced = reducir_pdf(path_pdf)
+        return base64.b64encode(reduced).decode("ascii") if reduced else self.read_pdf(path_pdf)
+
+    def _get_inference(self, content_pdf, cancel: Optional[threading.Event] = None):
+        """
+        Una solicitud a Claude. Como en OpenAIInference._openai_inference, la
+        respuesta se lee en streaming y se abandona si se activa cancel.
+        """
         try:
-            content_pdf = self.read_pdf(path_pdf)
-            message = self.client.messages.create(
+            _ANTHROPIC_LIMITER.wait()
+            parts = []
+            with self.client.messages.stream(
                 model=self.model,
                 max_tokens=1024,
+                # Prompt en el system con cache_control: Anthropic guarda ese
+                # prefijo y las solicitudes siguientes solo procesan el PDF
+                system=[
+                    {
+                        "type": "text",
+                        "text": self.prompt,
+                        "cache_control": {"type": "ephemeral"}
+                    }
+                ],
                 messages=[
                     {
                         "role": "user",
@@ -278,39 +669,48 @@ class AntropicInferenceForPDF(BaseInference):
                                     "media_type": "application/pdf",
                                     "data": content_pdf
                                 }
-                            },
-                            {
-                                "type": "text",
-                                "text": self.prompt
                             }
                         ]
                     }
                 ]
-            )
-            text_response = message.content[0]
-            response_dict = json.loads(text_response.text)
+            ) as stream:
+                for text in stream.text_stream:
+                    if cancel is not None and cancel.is_set():
+                        raise _Cancelled()
+                    parts.append(text)
+            # Mismo decodificador que parse_response: tolera texto o bloques de
+            # markdown alrededor del JSON, que json.loads rechazaba
+            response_dict = _first_json_object("".join(parts))
+            if not isinstance(response_dict, dict):
+                raise ResponseParsingError("No se encontró una estructura JSON válida en la respuesta")
+            response_dict['issue_date'] = _iso_date_or_none(response_dict.get('issue_date'))
+            response_dict['expiration_date'] = _iso_date_or_none(response_dict.get('expiration_date'))
             response_dict['message_error'] = None
-            print(response_dict)
+            logger.debug("Respuesta de Claude: %s", response_dict)
             return response_dict
 
+        except _Cancelled:
+            logger.debug("Solicitud a Claude cancelada: OpenAI respondió primero")
+            raise
+
         except anthropic.APIError as e:
             error_message = f"Error en la API de Anthropic: {str(e)}"
-            print(error_message)
+            logger.error(error_message)
             raise InferenceError(error_message)
 
         except anthropic.APIConnectionError as e:
             error_message = f"Error de conexión con la API de Anthropic: {str(e)}"
-            print(error_message)
+            logger.error(error_message)
             raise InferenceError(error_message)
 
         except anthropic.RateLimitError as e:
             error_message = f"Se ha excedido el límite de solicitudes a la API: {str(e)}"
-            print(error_message)
+            logger.error(error_message)
             raise InferenceError(error_message)
 
         except Exception as e:
             error_message = f"Error inesperado: {str(e)}"
-            print(error_message)
+            logger.error(error_message)
             raise InferenceError(error_message)
         
 if __name__ == "__main__":
@@ -1,13 +1,20 @@
-import pytesseract, time, fitz
+import json, logging, pytesseract, time, fitz
 from docx import Document
 from openpyxl import load_workbook
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from PIL import Image
 
 from utils import convert_pptx_to_pdf, convert_doc_to_pdf
 from ia import OpenAIInference, GeminiInferenceForImages
 
+logger = logging.getLogger(__name__)
+
+# Extensiones que se envían como imagen a Gemini
+_EXTENSIONES_IMAGEN = frozenset({'.jpg', '.jpeg', '.png'})
+# Documentos Word, que se convierten a PDF antes del OCR
+_EXTENSIONES_WORD = frozenset({'.docx', '.doc'})
+
 class OfficeDocumentExtractor:
     """
     Una clase unificada para extraer contenido de documentos de Microsoft Office.
@@ -65,69 +72,86 @@ class OfficeDocumentExtractor:
         return content
 
     def extract_pdf(self, file_path):
-        file = fitz.open(file_path)
-        for page in file:
+        """
+        Extrae el texto de la primera página de un PDF usando OCR.
+        Solo se carga esa página: no se recorre el resto del documento.
+        """
+        with fitz.open(file_path) as file:
+            if file.page_count == 0:
+                return None
             try:
                 # Convertimos la página a imagen
+                page = file.load_page(0)
                 pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
                 img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
                 # Realizamos OCR
                 text = pytesseract.image_to_string(img)
                 time.sleep(0.1)
-                # print(text)
-                # user_data = get_inference_for_pdf_open_ai(text)
                 return text
             except Exception as e:
-                print(f"Error en el procesamiento del pdf usando OCR: {str(e)}")
+                logger.error("Error en el procesamiento del pdf usando OCR: %s", e)
                 return None
-        file.close()
     
     def extract_content(self, file_path: str) -> Optional[Any]:
         """
         Método principal que determina el tipo de archivo y llama al método
         apropiado para extraer su contenido.
         """
+        content, _ = self.extract_content_with_transcription(file_path)
+        return content
+
+    def extract_content_with_transcription(self, file_path: str) -> Tuple[Optional[Any], Optional[str]]:
+        """
+        Igual que extract_content, pero devuelve también el texto extraído
+        que se envió al modelo.
+
+        Retorna: (info_certificado, transcripcion). La transcripción es None
+        cuando el archivo se envía directamente al modelo (imágenes).
+        """
         file_path = Path(file_path)
         
         if not file_path.exists():
             raise FileNotFoundError(f"El archivo {file_path} no existe")
 
         try:
-            if file_path.suffix.lower() == '.pdf':
+            extension = file_path.suffix.lower()
+            if extension == '.pdf':
                 content_doc = self.extract_pdf(str(file_path))
-                print('AAAAAAAAAAAAA',file_path)
+                logger.debug("PDF extraído: %s", file_path)
                 content = self.ia_inference.get_inference(content_doc, file_path)
-                return content
-            elif file_path.suffix.lower() == '.docx' or file_path.suffix.lower() == '.doc':
+                return content, content_doc
+            elif extension in _EXTENSIONES_WORD:
                 try:
                     pdf_path = convert_doc_to_pdf(file_path)
                     content_pdf = self.extract_pdf(pdf_path)
                     content = self.ia_inference.get_inference(content_pdf)
                 except Exception as e:
-                    print(f"Error procesando el PDF: {e}")
+                    logger.error("Error procesando el PDF: %s", e)
                     raise
                 else:
                     pdf_path.unlink()
-                    return content                   
-            elif file_path.suffix.lower() == '.xlsx':
-                content_doc = self.extract_xlsx(str(file_path))
-                content = self.ia_inference.get_inference(str(content_doc))
-                return content
-            elif file_path.suffix.lower() == '.pptx':
+                    return content, content_pdf                   
+            elif extension == '.xlsx':
+                # JSON en lugar de repr del diccionario: más rápido de generar
+                # y legible para el modelo (los acentos se conservan)
+                content_doc = json.dumps(self.extract_xlsx(str(file_path)), ensure_ascii=False)
+                content = self.ia_inference.get_inference(content_doc)
+                return content, content_doc
+            elif extension == '.pptx':
                 try:
                     pdf_path = convert_pptx_to_pdf(file_path)
                     content_pdf = self.extract_pdf(pdf_path)
                     content = self.ia_inference.get_inference(content_pdf)
                 except Exception as e:
-                    print(f"Error procesando el PDF: {e}")
+                    logger.error("Error procesando el PDF: %s", e)
                     raise
                 else:
                     pdf_path.unlink()
-                    return content
+                    return content, content_pdf
 
-            elif file_path.suffix.lower() == '.jpg' or file_path.suffix.lower() == '.JPG' or file_path.suffix.lower() == '.jpeg' or file_path.suffix.lower() == '.png' or file_path.suffix.lower() == '.PNG':
+            elif extension in _EXTENSIONES_IMAGEN:
                 content = self.ia_inference_for_images.get_inference(file_path)
-                return content
+                return content, None
             else:
                 raise ValueError(f"Formato de archivo no soportado: {file_path.suffix}")
 
@@ -1,7 +1,25 @@
 import subprocess
+import hashlib
+import json
+import mmap
+import random
+import tempfile
 from pathlib import Path
 import logging, os
 
+# La configuración de logging (nivel y formato) la hace el programa que usa el módulo
+logger = logging.getLogger(__name__)
+
+# Parámetros de MinHash para detectar certificados casi duplicados
+_MINHASH_PERMUTACIONES = 128
+_MINHASH_TAMANO_SHINGLE = 5
+_MINHASH_PRIMO = (1 << 61) - 1
+_generador = random.Random(857)
+_MINHASH_COEFICIENTES = [
+    (_generador.randrange(1, _MINHASH_PRIMO), _generador.randrange(0, _MINHASH_PRIMO))
+    for _ in range(_MINHASH_PERMUTACIONES)
+]
+
 def convert_pptx_to_pdf(pptx_path: str) -> Path:
     """
     Convierte un archivo PPTX a PDF usando LibreOffice y lo guarda en la misma carpeta.
@@ -21,10 +39,6 @@ def convert_pptx_to_pdf(pptx_path: str) -> Path:
         FileNotFoundError: Si el archivo PPTX no existe o LibreOffice no está instalado
         subprocess.CalledProcessError: Si hay un error durante la conversión
     """
-    # Configuramos logging para tener información del proceso
-    logging.basicConfig(level=logging.INFO, 
-                       format='%(asctime)s - %(message)s')
-    
     # Convertimos la ruta a objeto Path para mejor manejo
     input_path = Path(pptx_path).resolve()
     
@@ -38,7 +52,7 @@ def convert_pptx_to_pdf(pptx_path: str) -> Path:
     
     try:
         # Ejecutamos la conversión usando LibreOffice
-        logging.info(f"Iniciando conversión de {input_path.name}")
+        logger.info(f"Iniciando conversión de {input_path.name}")
         process = subprocess.run(
             [
                 'soffice',
@@ -66,19 +80,19 @@ def convert_pptx_to_pdf(pptx_path: str) -> Path:
         
         # Verificamos que el PDF se generó correctamente
         if pdf_path.exists():
-            logging.info(f"Conversión exitosa. PDF guardado en: {pdf_path}")
+            logger.info(f"Conversión exitosa. PDF guardado en: {pdf_path}")
             return pdf_path
         else:
             raise FileNotFoundError("No se generó el archivo PDF")
             
     except FileNotFoundError:
-        logging.error(
+        logger.error(
             "LibreOffice no está instalado. Por favor, instálalo con:\n"
             "sudo apt-get install libreoffice"
         )
         raise
     except Exception as e:
-        logging.error(f"Error durante la conversión: {str(e)}")
+        logger.error(f"Error durante la conversión: {str(e)}")
         raise
 
 def convert_doc_to_pdf(doc_path: str) -> Path:
@@ -101,10 +115,6 @@ def convert_doc_to_pdf(doc_path: str) -> Path:
         subprocess.CalledProcessError: Si ocurre un error durante el proceso de conversión
         ValueError: Si el archivo no tiene la extensión correcta
     """
-    # Configuramos el sistema de logging para tener un registro detallado del proceso
-    logging.basicConfig(level=logging.INFO, 
-                       format='%(asctime)s - %(message)s')
-    
     # Convertimos la ruta de entrada a un objeto Path para mejor manipulación
     input_path = Path(doc_path).resolve()
     
@@ -119,7 +129,7 @@ def convert_doc_to_pdf(doc_path: str) -> Path:
     
     try:
         # Iniciamos el proceso de conversión usando LibreOffice
-        # logging.info(f"Iniciando conversión de {input_path.name}")
+        # logger.info(f"Iniciando conversión de {input_path.name}")
         
         # Ejecutamos LibreOffice en modo headless (sin interfaz gráfica)
         process = subprocess.run(
@@ -141,22 +151,22 @@ def convert_doc_to_pdf(doc_path: str) -> Path:
         
         # Verificamos que el PDF se haya generado correctamente
         if pdf_path.exists():
-            # logging.info(f"Conversión exitosa. PDF guardado en: {pdf_path}")
+            # logger.info(f"Conversión exitosa. PDF guardado en: {pdf_path}")
             return pdf_path
         else:
             raise FileNotFoundError("No se pudo generar el archivo PDF")
             
     except FileNotFoundError:
-        logging.error(
+        logger.error(
             "LibreOffice no está instalado en el sistema. Para instalarlo, ejecuta:\n"
             "sudo apt-get install libreoffice"
         )
         raise
     except subprocess.CalledProcessError as e:
-        logging.error(f"Error durante la ejecución de LibreOffice: {e.stderr}")
+        logger.error(f"Error durante la ejecución de LibreOffice: {e.stderr}")
         raise
     except Exception as e:
-        logging.error(f"Error inesperado durante la conversión: {str(e)}")
+        logger.error(f"Error inesperado durante la conversión: {str(e)}")
         raise
 
 
@@ -197,7 +207,206 @@ def extraer_id_archivo(nombre_archivo: str) -> str | None:
     
     return None
 
-def renombrar_archivo_con_fechas(ruta_original: str, issue_date: str, expiration_date: str | None = None) -> None:
+def calcular_hash_archivo(ruta_archivo: str) -> str:
+    """
+    Calcula el hash SHA-256 del contenido de un archivo.
+
+    Sirve para detectar archivos idénticos byte a byte sin tener que
+    extraer su contenido. El archivo se mapea en memoria, así el kernel
+    carga las páginas a medida que el hash las recorre, sin copiarlas a
+    un buffer intermedio.
+
+    Args:
+        ruta_archivo: Ruta del archivo
+
+    Returns:
+        str: Hash SHA-256 en hexadecimal
+    """
+    with open(ruta_archivo, 'rb') as archivo:
+        # mmap no admite archivos vacíos
+        if os.fstat(archivo.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as contenido:
+            return hashlib.sha256(contenido).hexdigest()
+
+def reducir_pdf(pdf, dpi: int = 150, calidad_jpeg: int = 75,
+                tamano_minimo: int = 1_000_000) -> bytes | None:
+    """
+    Reconstruye un PDF escaneado pesado con cada página rasterizada como
+    JPEG a `dpi`, para enviarlo más liviano a un modelo.
+
+    Solo se reducen los PDFs de al menos `tamano_minimo` bytes en los que
+    ninguna página tiene texto y todas tienen imágenes. Un PDF digital
+    (aunque pese por sus fuentes o logos) se deja igual: rasterizarlo
+    perdería su capa de texto.
+
+    Args:
+        pdf: Ruta del PDF o su contenido en bytes
+        dpi: Resolución de las páginas rasterizadas
+        calidad_jpeg: Calidad JPEG (0-100) de cada página
+        tamano_minimo: Tamaño en bytes a partir del cual se intenta reducir
+
+    Returns:
+        bytes | None: El PDF reducido, o None si no es un escaneo pesado o
+        no resulta más pequeño que el original
+    """
+    tamano = len(pdf) if isinstance(pdf, bytes) else os.path.getsize(pdf)
+    if tamano < tamano_minimo:
+        return None
+
+    import fitz
+    escala = fitz.Matrix(dpi / 72, dpi / 72)
+    original = fitz.open(stream=pdf, filetype="pdf") if isinstance(pdf, bytes) else fitz.open(pdf)
+    with original, fitz.open() as reducido:
+        if not all(pagina.get_images() and not pagina.get_text().strip() for pagina in original):
+            return None
+        for pagina in original:
+            pixmap = pagina.get_pixmap(matrix=escala, alpha=False)
+            nueva = reducido.new_page(width=pagina.rect.width, height=pagina.rect.height)
+            nueva.insert_image(nueva.rect, stream=pixmap.tobytes("jpeg", jpg_quality=calidad_jpeg))
+        contenido = reducido.tobytes(garbage=3, deflate=False)
+
+    if len(contenido) >= tamano:
+        return None
+    logger.debug("PDF reducido de %d a %d bytes", tamano, len(contenido))
+    return contenido
+
+def calcular_firma_minhash(texto: str | None) -> tuple | None:
+    """
+    Calcula la firma MinHash de un texto a partir de sus shingles de 5 caracteres.
+
+    Dos textos con firmas parecidas tienen una similitud de Jaccard parecida,
+    lo que permite detectar copias escaneadas del mismo certificado aunque el
+    OCR introduzca pequeñas diferencias.
+
+    Args:
+        texto: Texto extraído del certificado
+
+    Returns:
+        tuple: Firma de 128 enteros
+        None: Si el texto es demasiado corto para calcular la firma
+    """
+    if not texto:
+        return None
+
+    # Normalizamos mayúsculas y espacios para que no afecten la comparación
+    texto = ' '.join(texto.lower().split())
+    shingles = {
+        texto[i:i + _MINHASH_TAMANO_SHINGLE]
+        for i in range(len(texto) - _MINHASH_TAMANO_SHINGLE + 1)
+    }
+    if not shingles:
+        return None
+
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'little')
+        for shingle in shingles
+    ]
+    return tuple(
+        min((a * h + b) % _MINHASH_PRIMO for h in hashes)
+        for a, b in _MINHASH_COEFICIENTES
+    )
+
+class IndiceMinHash:
+    """
+    Índice LSH sobre firmas MinHash para encontrar textos casi duplicados.
+
+    La firma se divide en bandas; dos firmas que coinciden en alguna banda son
+    candidatas y se confirman estimando su similitud de Jaccard.
+    """
+    def __init__(self, umbral: float = 0.9, bandas: int = 16):
+        self.umbral = umbral
+        self.bandas = bandas
+        self.filas_por_banda = _MINHASH_PERMUTACIONES // bandas
+        self.buckets = [{} for _ in range(bandas)]
+        self.firmas = {}
+
+    def _claves_bandas(self, firma: tuple):
+        for banda in range(self.bandas):
+            inicio = banda * self.filas_por_banda
+            yield banda, firma[inicio:inicio + self.filas_por_banda]
+
+    def consultar(self, firma: tuple) -> str | None:
+        """
+        Devuelve la clave del primer texto indexado cuya similitud estimada
+        con la firma alcanza el umbral, o None si no hay ninguno.
+        """
+        revisadas = set()
+        for banda, clave_banda in self._claves_bandas(firma):
+            for clave in self.buckets[banda].get(clave_banda, ()):
+                if clave in revisadas:
+                    continue
+                revisadas.add(clave)
+                otra = self.firmas[clave]
+                similitud = sum(x == y for x, y in zip(firma, otra)) / _MINHASH_PERMUTACIONES
+                if similitud >= self.umbral:
+                    return clave
+        return None
+
+    def insertar(self, clave: str, firma: tuple) -> None:
+        """Agrega una firma al índice bajo la clave indicada."""
+        self.firmas[clave] = firma
+        for banda, clave_banda in self._claves_bandas(firma):
+            self.buckets[banda].setdefault(clave_banda, []).append(clave)
+
+class CacheResultados:
+    """
+    Caché en disco de resultados serializables a JSON, un archivo por clave.
+
+    Se usa para no repetir la extracción de archivos que ya se procesaron en
+    una ejecución anterior. Para forzar una nueva extracción basta con borrar
+    el directorio de la caché.
+    """
+    def __init__(self, directorio: str):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+
+    def get(self, clave: str):
+        """Devuelve el valor guardado para la clave, o None si no existe."""
+        try:
+            with open(self.directorio / f"{clave}.json", encoding='utf-8') as archivo:
+                return json.load(archivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, clave: str, valor) -> None:
+        """
+        Guarda el valor de forma atómica (archivo temporal + os.replace). El
+        temporal tiene nombre único, así que varios hilos o procesos pueden
+        guardar la misma clave a la vez: queda la última escritura completa.
+        """
+        ruta = self.directorio / f"{clave}.json"
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.directorio,
+                                         suffix='.tmp', delete=False) as archivo:
+            json.dump(valor, archivo, ensure_ascii=False)
+        try:
+            os.replace(archivo.name, ruta)
+        except OSError:
+            os.unlink(archivo.name)
+            raise
+
+def archivo_ya_procesado(nombre_archivo: str) -> bool:
+    """
+    Indica si un archivo ya fue renombrado con sus fechas en una ejecución anterior.
+
+    Como 'issueddate' no contiene guiones bajos, basta con una búsqueda de
+    subcadena sobre el nombre completo, sin partirlo por '_'.
+
+    Args:
+        nombre_archivo: Ruta o nombre del archivo a verificar
+
+    Returns:
+        bool: True si el nombre ya contiene la fecha de emisión
+
+    Ejemplos:
+        >>> archivo_ya_procesado("52030365_maria_issueddate2018-07-28.pdf")
+        True
+        >>> archivo_ya_procesado("52030365_maria.pdf")
+        False
+    """
+    return 'issueddate' in os.path.basename(nombre_archivo)
+
+def renombrar_archivo_con_fechas(ruta_original: str, issue_date: str, expiration_date: str | None = None) -> str | None:
     """
     Renombra un archivo agregando las fechas al final, considerando que la fecha de expiración es opcional.
     
@@ -212,35 +421,57 @@ def renombrar_archivo_con_fechas(ruta_original: str, issue_date: str, expiration
         A:  52030365_maria_cristina_cardenas_issueddate2018-07-28_expirationdate2018-07-28.pdf
     Sin fecha de expiración:
         A:  52030365_maria_cristina_cardenas_issueddate2018-07-28.pdf
+
+    Si ya existe un archivo con el nuevo nombre no se sobrescribe: se agrega
+    un sufijo numérico (_1, _2, ...) antes de la extensión.
+
+    Returns:
+        str: Ruta del archivo renombrado
+        None: Si no se pudo renombrar
     """
     directorio = os.path.dirname(ruta_original)
     nombre_original = os.path.basename(ruta_original)
     nombre_sin_extension, extension = os.path.splitext(nombre_original)
     
-    # Convertimos la fecha de emisión de ISO a YYYY-MM-DD
-    fecha_emision = issue_date.split('T')[0]
-    
-    # Construimos el nuevo nombre empezando con la fecha de emisión
-    nuevo_nombre = f"{nombre_sin_extension}_issueddate{fecha_emision}"
+    # Construimos el nuevo nombre por partes y lo unimos una sola vez.
+    # split('T', 1)[0] convierte la fecha ISO a YYYY-MM-DD y deja igual
+    # una fecha que ya viene sin hora
+    partes = [nombre_sin_extension, f"_issueddate{issue_date.split('T', 1)[0]}"]
     
     # Agregamos la fecha de expiración solo si está presente
     if expiration_date:
-        fecha_expiracion = expiration_date.split('T')[0]
-        nuevo_nombre += f"_expirationdate{fecha_expiracion}"
-    
-    # Agregamos la extensión al final
-    nuevo_nombre += extension
+        partes.append(f"_expirationdate{expiration_date.split('T', 1)[0]}")
+    nuevo_nombre = ''.join(partes)
     
     # Creamos la ruta completa nueva
-    nueva_ruta = os.path.join(directorio, nuevo_nombre)
-    
+    nueva_ruta = os.path.join(directorio, nuevo_nombre + extension)
+
     try:
-        os.rename(ruta_original, nueva_ruta)
+        # Reservamos el nombre de destino con O_EXCL: falla si ya existe, así
+        # que cada intento cuesta una sola llamada y no hay carrera entre la
+        # verificación y el renombrado
+        contador = 0
+        while True:
+            try:
+                os.close(os.open(nueva_ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                break
+            except FileExistsError:
+                contador += 1
+                nueva_ruta = os.path.join(directorio, f"{nuevo_nombre}_{contador}{extension}")
+
+        try:
+            os.replace(ruta_original, nueva_ruta)
+        except OSError:
+            os.unlink(nueva_ruta)
+            raise
+
         print(f"Archivo renombrado correctamente:")
         print(f"De: {nombre_original}")
-        print(f"A:  {nuevo_nombre}")
+        print(f"A:  {os.path.basename(nueva_ruta)}")
+        return nueva_ruta
     except Exception as e:
         print(f"Error al renombrar el archivo: {str(e)}")
+        return None
 
 
 if __name__ == "__main__":